@@ -1,15 +1,14 @@
-from langchain_groq import ChatGroq
 from sqlalchemy.orm import Session
 
-from config.settings import GROQ_API_KEY
 from expert_finder.skill_extractor import skill_extractor_tool
 from expert_finder.skill_lookup import skill_lookup_tool
+from llm.registry import get_llm
 
 
 def ask_expert_agent(db: Session, query: str, user_department: str) -> str:
     extracted_skills = skill_extractor_tool(query)
     lookup_result = skill_lookup_tool(db, extracted_skills)
-    llm = ChatGroq(model="llama-3.3-70b-versatile", api_key=GROQ_API_KEY)
+    llm = get_llm()
     prompt = (
         "You are an expert finding agent. A user is asking for help with the following skills: "
         f"{', '.join(extracted_skills)}.\n\n"
@@ -1,18 +1,24 @@
+from typing import Any, AsyncIterator
+
 from langchain_core.messages import AIMessage, HumanMessage
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from db.crud import get_session_by_id, load_chat_history, save_messages
-from rag_qa.llm_client import run_qa_chain
+from rag_qa.llm_client import run_qa_chain, stream_qa_chain
 
 
-def handle_user_query(
-    session_id: int, user_message: str, space_key: str, db
+async def handle_user_query(
+    session_id: int, user_message: str, space_key: str, db: AsyncSession
 ) -> tuple[str, list[str], list[str]]:
-    session = get_session_by_id(db, session_id)
-    chat_history = load_chat_history(session)
-    assistant_answer, source_links, source_titles = run_qa_chain(
+    session = await get_session_by_id(db, session_id)
+    chat_history = await load_chat_history(db, session_id)
+    # Hand the connection back to the pool while the LLM runs; the answer is saved
+    # in a new short transaction
+    await db.commit()
+    assistant_answer, source_links, source_titles = await run_qa_chain(
         user_message, space_key, chat_history
     )
-    save_messages(
+    await save_messages(
         db,
         session,
         [
@@ -23,3 +29,32 @@ def handle_user_query(
         source_titles=source_titles,
     )
     return assistant_answer, source_links, source_titles
+
+
+## Streams QA events and persists the exchange only once the answer is complete
+async def stream_user_query(
+    session_id: int, user_message: str, space_key: str, db: AsyncSession
+) -> AsyncIterator[dict[str, Any]]:
+    session = await get_session_by_id(db, session_id)
+    chat_history = await load_chat_history(db, session_id)
+    await db.commit()
+
+    answer_parts = []
+    source_links, source_titles = [], []
+    async for event in stream_qa_chain(user_message, space_key, chat_history):
+        if event["type"] == "sources":
+            source_links, source_titles = event["links"], event["titles"]
+        elif event["type"] == "token":
+            answer_parts.append(event["content"])
+        yield event
+
+    await save_messages(
+        db,
+        session,
+        [
+            HumanMessage(content=user_message),
+            AIMessage(content="".join(answer_parts)),
+        ],
+        source_links=source_links,
+        source_titles=source_titles,
+    )
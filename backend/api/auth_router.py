@@ -1,12 +1,9 @@
 import datetime
 import uuid
-from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from langchain_core.output_parsers import PydanticOutputParser
-from langchain_groq import ChatGroq
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
@@ -15,21 +12,20 @@ from auth.auth import (
     get_current_user,
     hash_password,
     hash_refresh_token,
+    user_claims,
     verify_password,
 )
-from config.settings import GROQ_API_KEY, IS_DEVELOPMENT
+from config.settings import IS_DEVELOPMENT
 from db.crud import (
     create_employee,
-    create_position_skill,
     create_refresh_token,
     delete_refresh_token,
-    get_current_positions_levels,
     get_employee_by_email,
-    get_position_by_name_level,
-    get_refresh_token,
-    get_user_by_refresh_token,
+    get_employee_with_position,
+    rotate_refresh_token,
 )
 from db.db_auth import get_db
+from expert_finder.skill_catalog import get_catalog_position_id
 
 
 class RegisterUser(BaseModel):
@@ -46,43 +42,19 @@ class Token(BaseModel):
     token_type: str = "bearer"
 
 
-class PositionSkillsExtraction(BaseModel):
-    skills: List[str]
-
-
 router = APIRouter(tags=["auth"])
 
 
-def issue_refresh_token(db: Session, user_id: int):
+def new_refresh_token() -> tuple[str, str, datetime.datetime]:
     token_value = str(uuid.uuid4())
-    hashed = hash_refresh_token(token_value)
     expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=30)
-    token_db = create_refresh_token(db, user_id, hashed, expires)
-    return token_value, token_db
-
-
-def generate_skills_for_position(position: str, position_level: str) -> list[str]:
-    llm = ChatGroq(model="llama-3.3-70b-versatile", api_key=GROQ_API_KEY)
-
-    prompt = (
-        f"Generate a JSON list of hard skills for the position '{position}' at level '{position_level}'. "
-        "Include skills from lower levels for senior roles. "
-        "Focus ON tools, technologies, programming languages, frameworks, NOT on domain knowledge or soft skills (e.g. google meet is better than video conferencing). "
-        "Limit: Intern=5 skills, Junior=7, Middle=10, Senior/Team Lead=15. "
-        'Return JSON exactly like this: {"skills": ["skill1", "skill2"]}. '
-        "Do NOT include explanations, markdown, or anything else."
-    )
+    return token_value, hash_refresh_token(token_value), expires
 
-    parser = PydanticOutputParser(pydantic_object=PositionSkillsExtraction)
 
-    try:
-        response = llm.invoke([{"role": "system", "content": prompt}])
-        answer = response.content
-        skills = parser.parse(answer).skills
-    except Exception as e:
-        print(f"LLM parsing failed for {position} {position_level}: {e}")
-        skills = []
-    return [skill.lower() for skill in skills]
+def issue_refresh_token(db: Session, user_id: int):
+    token_value, hashed, expires = new_refresh_token()
+    token_db = create_refresh_token(db, user_id, hashed, expires)
+    return token_value, token_db
 
 
 @router.post("/register", response_model=Token)
@@ -91,7 +63,6 @@ async def register_user(payload: RegisterUser, db: Session = Depends(get_db)):
     department = payload.department.upper().strip()
     position = payload.position.upper().strip()
     position_level = payload.position_level.upper().strip()
-    password = hash_password(payload.password)
     allowed_departments = {"ML", "DB", "HR", "WEB"}
     allowed_position_levels = {"INTERN", "JUNIOR", "MIDDLE", "SENIOR", "TEAM LEAD"}
 
@@ -104,16 +75,14 @@ async def register_user(payload: RegisterUser, db: Session = Depends(get_db)):
     if get_employee_by_email(db, email):
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    if (position, position_level) not in get_current_positions_levels(db):
-        skills = generate_skills_for_position(position, position_level)
-        position_obj = create_position_skill(db, position, position_level, skills)
-    else:
-        position_obj = get_position_by_name_level(db, position, position_level)
+    # Skills for a new position are generated in the background
+    position_id = get_catalog_position_id(db, position, position_level)
 
+    password = await hash_password(payload.password)
     employee = create_employee(
-        db, payload.full_name, email, password, position_obj.id, department
+        db, payload.full_name, email, password, position_id, department
     )
-    access_token = create_access_token({"sub": employee.email})
+    access_token = create_access_token(user_claims(employee))
     raw_refresh_token, _ = issue_refresh_token(db, employee.id)
 
     response = JSONResponse({"access_token": access_token, "token_type": "bearer"})
@@ -133,10 +102,10 @@ async def login(
     form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
 ):
     employee = get_employee_by_email(db, form_data.username.lower().strip())
-    if not employee or not verify_password(form_data.password, employee.password):
+    if not employee or not await verify_password(form_data.password, employee.password):
         raise HTTPException(status_code=401, detail="Incorrect email or password")
 
-    access_token = create_access_token({"sub": employee.email})
+    access_token = create_access_token(user_claims(employee))
     raw_refresh_token, _ = issue_refresh_token(db, employee.id)
 
     response = JSONResponse({"access_token": access_token, "token_type": "bearer"})
@@ -157,25 +126,16 @@ async def refresh_token(request: Request, db: Session = Depends(get_db)):
     if not token_cookie:
         raise HTTPException(status_code=401, detail="Refresh token missing")
 
-    hashed_cookie = hash_refresh_token(token_cookie)
-    token_db = get_refresh_token(db, hashed_cookie)
-
-    if not token_db:
-        raise HTTPException(status_code=403, detail="Invalid refresh token")
-
-    now = datetime.datetime.now(datetime.timezone.utc)
-    expires_at = token_db.expires_at
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=datetime.timezone.utc)
-    if expires_at < now:
-        delete_refresh_token(db, hashed_cookie)
-        raise HTTPException(status_code=403, detail="Refresh token expired")
-
-    delete_refresh_token(db, hashed_cookie)
+    # Checking, consuming and replacing the token is one conditional UPDATE
+    raw_refresh_token, hashed, expires = new_refresh_token()
+    user_id = rotate_refresh_token(
+        db, hash_refresh_token(token_cookie), hashed, expires
+    )
+    if user_id is None:
+        raise HTTPException(status_code=403, detail="Invalid or expired refresh token")
 
-    employee = get_user_by_refresh_token(db, token_db)
-    access_token = create_access_token({"sub": employee.email})
-    raw_refresh_token, _ = issue_refresh_token(db, employee.id)
+    employee = get_employee_with_position(db, user_id)
+    access_token = create_access_token(user_claims(employee))
 
     response = JSONResponse({"access_token": access_token, "token_type": "bearer"})
     response.set_cookie(
@@ -207,6 +167,6 @@ async def get_current_user_info(current_user=Depends(get_current_user)):
         "full_name": current_user.full_name,
         "email": current_user.email,
         "department": current_user.department,
-        "position": current_user.position_obj.position,
-        "position_level": current_user.position_obj.position_level,
+        "position": current_user.position,
+        "position_level": current_user.position_level,
     }
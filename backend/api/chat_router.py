@@ -1,23 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+import datetime
+import hashlib
+import json
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_groq import ChatGroq
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from agents.qa_agent import handle_user_query
+from agents.qa_agent import handle_user_query, stream_user_query
 from auth.auth import get_current_user
-from config.settings import GROQ_API_KEY
 from db.crud import (
     create_session,
     delete_session,
     ensure_session_ownership,
+    get_messages_for_session,
     get_sessions_for_user,
     rename_session,
 )
-from db.db_auth import get_db
+from db.db_auth import AsyncSessionLocal, get_async_db
+from llm.registry import get_llm
 
 router = APIRouter()
 
+CHATS_PAGE_SIZE = 50
+MESSAGES_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 200
+
 
 class RenameChatRequest(BaseModel):
     new_name: str
@@ -27,8 +37,8 @@ class AskRequest(BaseModel):
     query: str
 
 
-def generate_session_name(first_message: str) -> str:
-    llm = ChatGroq(api_key=GROQ_API_KEY, model="llama-3.3-70b-versatile")
+async def generate_session_name(first_message: str) -> str:
+    llm = get_llm()
 
     prompt = ChatPromptTemplate.from_messages(
         [
@@ -41,7 +51,7 @@ def generate_session_name(first_message: str) -> str:
         ]
     )
 
-    response = llm.invoke(prompt.format_messages())
+    response = await llm.ainvoke(prompt.format_messages())
     title = response.content.strip()
 
     if not title:
@@ -52,9 +62,9 @@ def generate_session_name(first_message: str) -> str:
 
 @router.post("/chats")
 async def create_chat(
-    current_user=Depends(get_current_user), db: Session = Depends(get_db)
+    current_user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)
 ):
-    session = create_session(db, current_user.id, None)
+    session = await create_session(db, current_user.id, None)
     return {"session_id": session.id, "name": None}
 
 
@@ -62,12 +72,12 @@ async def create_chat(
 async def delete_chat(
     session_id: int,
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    session = ensure_session_ownership(db, session_id, current_user.id)
+    session = await ensure_session_ownership(db, session_id, current_user.id)
     if not session:
         raise HTTPException(403, "Access denied to this chat session")
-    delete_session(db, session_id)
+    await delete_session(db, session_id)
     return {"detail": "Chat session deleted"}
 
 
@@ -76,60 +86,120 @@ async def rename_chat(
     session_id: int,
     req: RenameChatRequest,
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    session = ensure_session_ownership(db, session_id, current_user.id)
+    session = await ensure_session_ownership(db, session_id, current_user.id)
     if not session:
         raise HTTPException(403, "Access denied to this chat session")
-    renamed_session = rename_session(db, session_id, req.new_name)
+    renamed_session = await rename_session(db, session_id, req.new_name)
     return {"id": renamed_session.id, "name": renamed_session.name}
 
 
+## Opaque keyset cursors: the sort key of the last item on the previous page
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+
+
+## JSON page with a content ETag; a matching If-None-Match gets an empty 304
+def conditional_json(
+    body: list, next_cursor: str | None, if_none_match: str | None
+) -> Response:
+    payload = json.dumps(body).encode()
+    etag = f'W/"{hashlib.sha256(payload).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(payload, media_type="application/json", headers=headers)
+
+
 @router.get("/chats")
 async def list_chats(
-    current_user=Depends(get_current_user), db: Session = Depends(get_db)
+    limit: int = Query(CHATS_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    if_none_match: str | None = Header(None),
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    sessions = get_sessions_for_user(db, current_user.id)
-    return [{"id": s.id, "name": s.name} for s in sessions]
+    after = None
+    if cursor:
+        try:
+            last_active, session_id = decode_cursor(cursor)
+            after = (datetime.datetime.fromisoformat(last_active), int(session_id))
+        except (TypeError, ValueError):
+            raise HTTPException(400, "Invalid cursor")
+
+    sessions = await get_sessions_for_user(db, current_user.id, limit, after)
+    next_cursor = None
+    if len(sessions) == limit:
+        last = sessions[-1]
+        next_cursor = encode_cursor([last.last_active.isoformat(), last.id])
+    return conditional_json(
+        [{"id": s.id, "name": s.name} for s in sessions], next_cursor, if_none_match
+    )
 
 
 @router.get("/chats/{session_id}/messages")
 async def get_chat_messages(
     session_id: int,
+    limit: int = Query(MESSAGES_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    if_none_match: str | None = Header(None),
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    session = ensure_session_ownership(db, session_id, current_user.id)
+    session = await ensure_session_ownership(db, session_id, current_user.id)
     if not session:
         raise HTTPException(403, "Access denied to this chat session")
-    messages = sorted(session.messages, key=lambda m: m.id)
-    return [
-        {
-            "id": m.id,
-            "chat_id": session.id,
-            "role": m.role,
-            "content": m.content,
-            "links": m.source_links if m.source_links else [],
-            "titles": m.source_titles if m.source_titles else [],
-            "created_at": m.created_at.isoformat(),
-        }
-        for m in messages
-    ]
+
+    before_id = None
+    if cursor:
+        try:
+            (before_id,) = decode_cursor(cursor)
+            before_id = int(before_id)
+        except (TypeError, ValueError):
+            raise HTTPException(400, "Invalid cursor")
+
+    # Pages walk backwards from the newest message; each page is in chronological order
+    messages = await get_messages_for_session(db, session_id, limit, before_id)
+    next_cursor = encode_cursor([messages[0].id]) if len(messages) == limit else None
+    return conditional_json(
+        [
+            {
+                "id": m.id,
+                "chat_id": session.id,
+                "role": m.role,
+                "content": m.content,
+                "links": m.source_links if m.source_links else [],
+                "titles": m.source_titles if m.source_titles else [],
+                "created_at": m.created_at.isoformat(),
+            }
+            for m in messages
+        ],
+        next_cursor,
+        if_none_match,
+    )
 
 
 @router.post("/chats/{session_id}/ask")
 async def ask_in_chat(
     session_id: int,
     req: AskRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_user),
 ):
-    session = ensure_session_ownership(db, session_id, current_user.id)
+    session = await ensure_session_ownership(db, session_id, current_user.id)
     if not session:
         raise HTTPException(403, "Access denied to this chat session")
 
     try:
-        answer, links, titles = handle_user_query(
+        answer, links, titles = await handle_user_query(
             session_id, req.query, current_user.department, db
         )
     except Exception as e:
@@ -139,8 +209,8 @@ async def ask_in_chat(
         raise HTTPException(500, f"Internal error: {msg}")
 
     if not session.name:
-        session.name = generate_session_name(req.query)
-        db.commit()
+        session.name = await generate_session_name(req.query)
+        await db.commit()
 
     return {
         "answer": answer,
@@ -148,3 +218,52 @@ async def ask_in_chat(
         "titles": titles,
         "session_name": session.name,
     }
+
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/chats/{session_id}/ask/stream")
+async def ask_in_chat_stream(
+    session_id: int,
+    req: AskRequest,
+    db: AsyncSession = Depends(get_async_db, scope="function"),
+    current_user=Depends(get_current_user),
+):
+    session = await ensure_session_ownership(db, session_id, current_user.id)
+    if not session:
+        raise HTTPException(403, "Access denied to this chat session")
+
+    department = current_user.department
+    session_name = session.name
+
+    # The request session is closed once this function returns, so the generator
+    # opens its own and holds a connection only for its short reads and writes.
+    # If the client disconnects, Starlette cancels it and nothing is persisted.
+    async def event_stream():
+        name = session_name
+        async with AsyncSessionLocal() as stream_db:
+            try:
+                async for event in stream_user_query(
+                    session_id, req.query, department, stream_db
+                ):
+                    event_type = event.pop("type")
+                    yield format_sse(event_type, event)
+
+                if not name:
+                    name = await generate_session_name(req.query)
+                    await rename_session(stream_db, session_id, name)
+            except Exception as e:
+                msg = str(e)
+                status = 429 if "rate_limit_exceeded" in msg or "429" in msg else 500
+                yield format_sse("error", {"status": status, "detail": msg})
+                return
+
+            yield format_sse("done", {"session_name": name})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+
+from auth.auth import get_current_user
+from rag_qa.query_rewriter import get_rewrite_stats
+from rag_qa.vector_db_builder import get_build_status
+
+router = APIRouter()
+
+
+## Progress of the background index build; the previous index serves meanwhile
+@router.get("/status")
+def get_index_status(current_user=Depends(get_current_user)):
+    return get_build_status()
+
+
+## How this worker resolved follow-up queries: as is, from the rewrite cache or by LLM
+@router.get("/rewrite-stats")
+def get_query_rewrite_stats(current_user=Depends(get_current_user)):
+    return get_rewrite_stats()
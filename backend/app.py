@@ -1,28 +1,65 @@
-import os
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from qdrant_client import QdrantClient
 from tenacity import retry, stop_after_attempt, wait_exponential
 
-from api import auth_router, chat_router
-from rag_qa.vector_db_builder import build_vector_db
-
-qdrant_url = os.environ.get("QDRANT_URL", "http://localhost:6333")
-collection_name = "confluence_docs"
+from api import auth_router, chat_router, index_router
+from auth.auth import run_refresh_token_sweeper
+from config.settings import (
+    INDEX_SYNC_INTERVAL_SECONDS,
+    REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS,
+    SKILL_CATALOG_INTERVAL_SECONDS,
+)
+from expert_finder.skill_catalog import run_skill_catalog_worker
+from llm.registry import close_llm_clients
+from rag_qa.answer_cache import ensure_answer_cache_collection
+from rag_qa.embedding_service import close_qdrant_clients, get_qdrant_client, warm_up
+from rag_qa.index_sync import claim_index_jobs, run_index_sync_periodically
+from rag_qa.vector_db_builder import index_needs_build, rebuild_index
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     @retry(stop=stop_after_attempt(5), wait=wait_exponential(min=2, max=10))
-    def ensure_db_ready():
-        client = QdrantClient(url=qdrant_url)
-        if not client.collection_exists(collection_name):
-            build_vector_db(url=qdrant_url, collection=collection_name)
+    def ensure_db_ready() -> bool:
+        return index_needs_build(get_qdrant_client())
+
+    warm_up()
+
+    # With several workers, one of them owns index setup and the background jobs
+    tasks = []
+    if claim_index_jobs():
+        build_needed = ensure_db_ready()
+        ensure_answer_cache_collection()
 
-    ensure_db_ready()
+        # The API starts right away; the build swaps its collection in when it is done
+        if build_needed:
+            tasks.append(asyncio.create_task(asyncio.to_thread(rebuild_index)))
+        if INDEX_SYNC_INTERVAL_SECONDS > 0:
+            tasks.append(
+                asyncio.create_task(
+                    run_index_sync_periodically(INDEX_SYNC_INTERVAL_SECONDS)
+                )
+            )
+        if REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS > 0:
+            tasks.append(
+                asyncio.create_task(
+                    run_refresh_token_sweeper(REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS)
+                )
+            )
+        if SKILL_CATALOG_INTERVAL_SECONDS > 0:
+            tasks.append(
+                asyncio.create_task(
+                    run_skill_catalog_worker(SKILL_CATALOG_INTERVAL_SECONDS)
+                )
+            )
     yield
+    for task in tasks:
+        task.cancel()
+    await close_llm_clients()
+    await close_qdrant_clients()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -33,7 +70,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 app.include_router(auth_router.router, prefix="/auth")
 app.include_router(chat_router.router, prefix="/chat")
+app.include_router(index_router.router, prefix="/index")
@@ -1,31 +1,125 @@
+import asyncio
 import datetime
 import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from pydantic import BaseModel
 
-from config.settings import JWT_ALGORITHM, JWT_EXPIRATION_MINUTES, JWT_SECRET_KEY
-from db.crud import get_employee_by_email
-from db.db_auth import get_db
+from config.settings import (
+    BCRYPT_ROUNDS,
+    JWT_ALGORITHM,
+    JWT_EXPIRATION_MINUTES,
+    JWT_SECRET_KEY,
+    PASSWORD_HASH_MAX_PENDING,
+    PASSWORD_HASH_WORKERS,
+    REFRESH_TOKEN_SWEEP_BATCH_SIZE,
+)
+from db.crud import delete_expired_refresh_tokens
+from db.db_auth import AsyncSessionLocal
 from db.models import Employee
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
+## Identity of the caller, as carried by the access token
+class CurrentUser(BaseModel):
+    id: int
+    email: str
+    full_name: str
+    department: str
+    position: str | None = None
+    position_level: str | None = None
+
+
+def user_from_employee(employee: Employee) -> CurrentUser:
+    position = employee.position_obj
+    return CurrentUser(
+        id=employee.id,
+        email=employee.email,
+        full_name=employee.full_name,
+        department=employee.department,
+        position=position.position if position else None,
+        position_level=position.position_level if position else None,
+    )
+
+
+def user_claims(employee: Employee) -> dict:
+    user = user_from_employee(employee)
+    return {
+        "sub": user.email,
+        "uid": user.id,
+        "name": user.full_name,
+        "department": user.department,
+        "position": user.position,
+        "position_level": user.position_level,
+    }
+
+
 def hash_refresh_token(token: str) -> str:
     return hashlib.sha256(token.encode()).hexdigest()
 
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+## Expired refresh tokens are removed in small batches, each its own transaction,
+## so the sweep never holds long locks on the table the refresh endpoint writes to
+async def run_refresh_token_sweeper(interval_seconds: int) -> None:
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                deleted = await delete_expired_refresh_tokens(
+                    db, REFRESH_TOKEN_SWEEP_BATCH_SIZE
+                )
+            if deleted:
+                print("Expired refresh tokens removed:", deleted)
+        except Exception as e:
+            print("Refresh token sweep failed:", e)
+        await asyncio.sleep(interval_seconds)
+
+
+## bcrypt runs on its own small pool (it releases the GIL), never on the event loop.
+## Past PASSWORD_HASH_MAX_PENDING queued or running jobs new ones are refused, so a
+## login storm is turned away instead of queuing up behind itself
+HASH_RETRY_AFTER_SECONDS = 1
+
+_hash_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+_hash_pending_lock = threading.Lock()
+_hash_pending = 0
+
 
+async def run_password_job(fn, *args):
+    global _hash_pending
+    with _hash_pending_lock:
+        if _hash_pending >= PASSWORD_HASH_MAX_PENDING:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many sign-in attempts in progress. Try again shortly.",
+                headers={"Retry-After": str(HASH_RETRY_AFTER_SECONDS)},
+            )
+        _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            _hash_executor, fn, *args
+        )
+    finally:
+        with _hash_pending_lock:
+            _hash_pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await run_password_job(pwd_context.hash, password)
 
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+
+async def verify_password(plain: str, hashed: str) -> bool:
+    return await run_password_job(pwd_context.verify, plain, hashed)
 
 
 def create_access_token(
@@ -39,13 +133,13 @@ def create_access_token(
     return jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-) -> Employee:
+## Identity comes from the token claims, trusted until the token expires. Tokens issued
+## before the claims existed are refused, and the client's refresh replaces them
+def get_current_user(token: str = Depends(oauth2_scheme)) -> CurrentUser:
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
         user_email: str = payload.get("sub")
-        if user_email is None:
+        if user_email is None or "uid" not in payload:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token."
             )
@@ -54,10 +148,11 @@ def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token."
         )
 
-    user = get_employee_by_email(db, user_email)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found."
-        )
-
-    return user
+    return CurrentUser(
+        id=payload["uid"],
+        email=user_email,
+        full_name=payload.get("name") or "",
+        department=payload.get("department") or "",
+        position=payload.get("position"),
+        position_level=payload.get("position_level"),
+    )
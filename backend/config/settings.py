@@ -15,8 +15,68 @@ CONFLUENCE_API_TOKEN = os.environ.get("CONFLUENCE_API_TOKEN")
 DATABASE_URL = os.environ.get("DATABASE_URL")
 
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
-HF_API_TOKEN = os.environ.get("HF_API_TOKEN")
 
 JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY")
 JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM")
 JWT_EXPIRATION_MINUTES = int(os.environ.get("JWT_EXPIRATION_MINUTES", 30))
+
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 16))
+REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS = int(
+    os.environ.get("REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS", 3600)
+)
+REFRESH_TOKEN_SWEEP_BATCH_SIZE = int(
+    os.environ.get("REFRESH_TOKEN_SWEEP_BATCH_SIZE", 1000)
+)
+SKILL_CATALOG_INTERVAL_SECONDS = int(
+    os.environ.get("SKILL_CATALOG_INTERVAL_SECONDS", 10)
+)
+SKILL_CATALOG_BATCH_SIZE = int(os.environ.get("SKILL_CATALOG_BATCH_SIZE", 8))
+SKILL_CATALOG_RETRY_SECONDS = int(os.environ.get("SKILL_CATALOG_RETRY_SECONDS", 60))
+SKILL_CATALOG_MAX_ATTEMPTS = int(os.environ.get("SKILL_CATALOG_MAX_ATTEMPTS", 5))
+
+QDRANT_URL = os.environ.get("QDRANT_URL", "http://localhost:6333")
+QDRANT_COLLECTION = os.environ.get("QDRANT_COLLECTION", "confluence_docs")
+
+EMBEDDING_MODEL_NAME = os.environ.get(
+    "EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2"
+)
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", 32))
+EMBEDDING_BUILD_BATCH_SIZE = int(os.environ.get("EMBEDDING_BUILD_BATCH_SIZE", 64))
+EMBEDDING_PROCESSES = int(os.environ.get("EMBEDDING_PROCESSES", 1))
+EMBEDDING_CLI_PROCESSES = int(
+    os.environ.get("EMBEDDING_CLI_PROCESSES", os.cpu_count() or 1)
+)
+EMBEDDING_STORE_ENABLED = (
+    os.environ.get("EMBEDDING_STORE_ENABLED", "true").lower() == "true"
+)
+
+CHAT_HISTORY_WINDOW = int(os.environ.get("CHAT_HISTORY_WINDOW", 3))
+
+LLM_MODEL_NAME = os.environ.get("LLM_MODEL_NAME", "llama-3.3-70b-versatile")
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", 20))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("LLM_MAX_KEEPALIVE_CONNECTIONS", 10))
+
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_COLLECTION = os.environ.get("ANSWER_CACHE_COLLECTION", "qa_answer_cache")
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(
+    os.environ.get("ANSWER_CACHE_SIMILARITY_THRESHOLD", 0.95)
+)
+ANSWER_CACHE_TTL_SECONDS = int(os.environ.get("ANSWER_CACHE_TTL_SECONDS", 7 * 86400))
+
+INDEX_SYNC_INTERVAL_SECONDS = int(os.environ.get("INDEX_SYNC_INTERVAL_SECONDS", 21600))
+
+CONFLUENCE_MAX_WORKERS = int(os.environ.get("CONFLUENCE_MAX_WORKERS", 8))
+CONFLUENCE_PAGE_LIMIT = int(os.environ.get("CONFLUENCE_PAGE_LIMIT", 100))
+CONFLUENCE_MAX_RETRIES = int(os.environ.get("CONFLUENCE_MAX_RETRIES", 5))
+
+INDEX_UPSERT_BATCH_SIZE = int(os.environ.get("INDEX_UPSERT_BATCH_SIZE", 256))
+
+LOCAL_DATA_DIR = os.environ.get("LOCAL_DATA_DIR", "data")
+
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", 1))
+
+CHUNK_MAX_TOKENS = int(os.environ.get("CHUNK_MAX_TOKENS", 250))
+CHUNK_MIN_TOKENS = int(os.environ.get("CHUNK_MIN_TOKENS", 40))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("CHUNK_OVERLAP_TOKENS", 32))
@@ -2,10 +2,22 @@ import datetime
 from typing import List
 
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from sqlalchemy import delete, or_, select, tuple_, update
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import Session
-
-from db.models import ChatHistory, ChatSession, Employee, PositionsSkills, RefreshToken
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+
+from config.settings import CHAT_HISTORY_WINDOW
+from db.models import (
+    ChatHistory,
+    ChatSession,
+    Employee,
+    PositionsSkills,
+    RefreshToken,
+    utc_now,
+)
 
 ## ----- Employee CRUD -----
 
@@ -35,6 +47,10 @@ def get_employee_by_email(db: Session, email: str) -> Employee | None:
     return db.query(Employee).filter(Employee.email == email).first()
 
 
+def get_employee_with_position(db: Session, employee_id: int) -> Employee | None:
+    return db.get(Employee, employee_id, options=[joinedload(Employee.position_obj)])
+
+
 def get_employees_by_skills(db: Session, skills: list[str]):
     return (
         db.query(Employee)
@@ -47,70 +63,103 @@ def get_employees_by_skills(db: Session, skills: list[str]):
 ## ----- Sessions CRUD -----
 
 
-def get_session_by_id(db: Session, session_id: int) -> ChatSession | None:
-    return db.query(ChatSession).filter(ChatSession.id == session_id).first()
+async def get_session_by_id(db: AsyncSession, session_id: int) -> ChatSession | None:
+    return await db.get(ChatSession, session_id)
 
 
-def get_sessions_for_user(db, user_id: int) -> List[ChatSession]:
-    return (
-        db.query(ChatSession)
-        .filter(ChatSession.user_id == user_id)
-        .order_by(ChatSession.last_active.desc())
-        .all()
+## Newest first; `after` is the (last_active, id) of the previous page's last session
+async def get_sessions_for_user(
+    db: AsyncSession,
+    user_id: int,
+    limit: int,
+    after: tuple[datetime.datetime, int] | None = None,
+) -> List[ChatSession]:
+    query = select(ChatSession).where(ChatSession.user_id == user_id)
+    if after:
+        query = query.where(tuple_(ChatSession.last_active, ChatSession.id) < after)
+    result = await db.scalars(
+        query.order_by(ChatSession.last_active.desc(), ChatSession.id.desc()).limit(
+            limit
+        )
     )
+    return list(result)
 
 
-def create_session(db: Session, user_id: int, name: str | None) -> ChatSession:
+async def create_session(
+    db: AsyncSession, user_id: int, name: str | None
+) -> ChatSession:
     session = ChatSession(user_id=user_id, name=name)
     db.add(session)
-    db.commit()
-    db.refresh(session)
+    await db.commit()
+    await db.refresh(session)
     return session
 
 
-def delete_session(db: Session, session_id: int):
-    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
-    if session:
-        db.delete(session)
-        db.commit()
+async def delete_session(db: AsyncSession, session_id: int):
+    await db.execute(delete(ChatHistory).where(ChatHistory.session_id == session_id))
+    await db.execute(delete(ChatSession).where(ChatSession.id == session_id))
+    await db.commit()
 
 
-def rename_session(db: Session, session_id: int, new_name: str) -> ChatSession | None:
-    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+async def rename_session(
+    db: AsyncSession, session_id: int, new_name: str
+) -> ChatSession | None:
+    session = await db.get(ChatSession, session_id)
     if session:
         session.name = new_name
-        db.commit()
+        await db.commit()
 
     return session
 
 
-def ensure_session_ownership(
-    db: Session, session_id: int, user_id: int
+async def ensure_session_ownership(
+    db: AsyncSession, session_id: int, user_id: int
 ) -> ChatSession | None:
-    session = (
-        db.query(ChatSession)
-        .filter(ChatSession.id == session_id, ChatSession.user_id == user_id)
-        .first()
+    return await db.scalar(
+        select(ChatSession).where(
+            ChatSession.id == session_id, ChatSession.user_id == user_id
+        )
     )
-    return session
 
 
 ## ----- Chat History CRUD -----
 
 
-def load_chat_history(session: ChatSession) -> List[BaseMessage]:
+## The latest `limit` messages before `before_id`, returned oldest first
+async def get_messages_for_session(
+    db: AsyncSession, session_id: int, limit: int, before_id: int | None = None
+) -> List[ChatHistory]:
+    query = select(ChatHistory).where(ChatHistory.session_id == session_id)
+    if before_id is not None:
+        query = query.where(ChatHistory.id < before_id)
+    result = await db.scalars(query.order_by(ChatHistory.id.desc()).limit(limit))
+    return list(reversed(list(result)))
+
+
+## Only the newest messages of the session, read newest-first on (session_id, id)
+async def load_chat_history(
+    db: AsyncSession, session_id: int, limit: int = CHAT_HISTORY_WINDOW
+) -> List[BaseMessage]:
+    rows = (
+        await db.execute(
+            select(ChatHistory.role, ChatHistory.content)
+            .where(ChatHistory.session_id == session_id)
+            .order_by(ChatHistory.id.desc())
+            .limit(limit)
+        )
+    ).all()
+
     messages = []
-    sorted_msgs = sorted(session.messages, key=lambda m: m.id)
-    for msg in sorted_msgs:
-        if msg.role == "user":
-            messages.append(HumanMessage(content=msg.content))
+    for role, content in reversed(rows):
+        if role == "user":
+            messages.append(HumanMessage(content=content))
         else:
-            messages.append(AIMessage(content=msg.content))
+            messages.append(AIMessage(content=content))
     return messages
 
 
-def save_messages(
-    db: Session,
+async def save_messages(
+    db: AsyncSession,
     session: ChatSession,
     messages: List[BaseMessage],
     source_links: List[str] | None = None,
@@ -135,28 +184,52 @@ def save_messages(
             source_titles=msg_titles,
         )
         db.add(db_msg)
-    session.last_active = datetime.datetime.now(datetime.timezone.utc)
-    db.commit()
+    session.last_active = utc_now()
+    await db.commit()
 
 
 ## ----- Refresh Token CRUD -----
 
 
+def _insert_for(db: Session):
+    return (
+        postgresql_insert
+        if db.get_bind().dialect.name == "postgresql"
+        else sqlite_insert
+    )
+
+
+## One token per user: an upsert on user_id replaces the previous one in one statement
 def create_refresh_token(
     db: Session, user_id: int, token: str, expires_at: datetime.datetime
 ) -> RefreshToken:
-    db.query(RefreshToken).filter(RefreshToken.user_id == user_id).delete()
-    db.commit()
-
-    refresh_token = RefreshToken(user_id=user_id, token=token, expires_at=expires_at)
-    db.add(refresh_token)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    insert = _insert_for(db)(RefreshToken).values(
+        user_id=user_id, token=token, expires_at=expires_at, created_at=now
+    )
+    refresh_token = db.scalar(
+        insert.on_conflict_do_update(
+            index_elements=[RefreshToken.user_id],
+            set_={"token": token, "expires_at": expires_at, "created_at": now},
+        ).returning(RefreshToken)
+    )
     db.commit()
-    db.refresh(refresh_token)
     return refresh_token
 
 
-def get_refresh_token(db: Session, hashed_token: str) -> RefreshToken | None:
-    return db.query(RefreshToken).filter(RefreshToken.token == hashed_token).first()
+## Swap a live token for a new one atomically; None if it is unknown, used or expired
+def rotate_refresh_token(
+    db: Session, hashed_token: str, new_hashed_token: str, expires_at: datetime.datetime
+) -> int | None:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    user_id = db.scalar(
+        update(RefreshToken)
+        .where(RefreshToken.token == hashed_token, RefreshToken.expires_at > now)
+        .values(token=new_hashed_token, expires_at=expires_at, created_at=now)
+        .returning(RefreshToken.user_id)
+    )
+    db.commit()
+    return user_id
 
 
 def delete_refresh_token(db: Session, hashed_token: str):
@@ -164,8 +237,24 @@ def delete_refresh_token(db: Session, hashed_token: str):
     db.commit()
 
 
-def get_user_by_refresh_token(db: Session, token_db: RefreshToken) -> Employee | None:
-    return db.query(Employee).filter(Employee.id == token_db.user_id).first()
+## Removes at most batch_size expired tokens per statement, committing in between
+async def delete_expired_refresh_tokens(db: AsyncSession, batch_size: int) -> int:
+    deleted = 0
+    while True:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        expired_ids = (
+            select(RefreshToken.id)
+            .where(RefreshToken.expires_at < now)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            delete(RefreshToken).where(RefreshToken.id.in_(expired_ids))
+        )
+        await db.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
 
 
 ## ----- Positions Skills CRUD -----
@@ -183,23 +272,89 @@ def create_position_skill(
     return pos_skill
 
 
-def get_current_positions_levels(db: Session) -> List[tuple[str, str]]:
-    result = (
-        db.query(PositionsSkills.position, PositionsSkills.position_level)
-        .distinct()
-        .all()
-    )
-    return [(pos, lvl) for pos, lvl in result]
-
-
 def get_position_by_name_level(
     db: Session, position: str, position_level: str
 ) -> PositionsSkills | None:
     return (
         db.query(PositionsSkills)
         .filter(
-            PositionsSkills.position == position
-            and PositionsSkills.position_level == position_level
+            PositionsSkills.position == position,
+            PositionsSkills.position_level == position_level,
         )
         .first()
     )
+
+
+## A pair seen for the first time is stored with no skills and left for the catalog worker;
+## concurrent registrations of the same pair all end up with the one row
+def get_or_create_position(
+    db: Session, position: str, position_level: str
+) -> PositionsSkills:
+    pos_skill = get_position_by_name_level(db, position, position_level)
+    if pos_skill is None:
+        db.execute(
+            _insert_for(db)(PositionsSkills)
+            .values(
+                position=position,
+                position_level=position_level,
+                skills=[],
+                skills_pending=True,
+            )
+            .on_conflict_do_nothing(
+                index_elements=[
+                    PositionsSkills.position,
+                    PositionsSkills.position_level,
+                ]
+            )
+        )
+        db.commit()
+        pos_skill = get_position_by_name_level(db, position, position_level)
+    return pos_skill
+
+
+## Pending pairs that are due, least-tried first, so pairs that keep failing never
+## crowd out new ones
+async def get_pending_positions(db: AsyncSession, limit: int) -> List[PositionsSkills]:
+    result = await db.execute(
+        select(PositionsSkills)
+        .where(
+            PositionsSkills.skills_pending,
+            or_(
+                PositionsSkills.skills_retry_at.is_(None),
+                PositionsSkills.skills_retry_at <= utc_now(),
+            ),
+        )
+        .order_by(PositionsSkills.skills_attempts, PositionsSkills.id)
+        .limit(limit)
+    )
+    return list(result.scalars())
+
+
+async def set_position_skills(db: AsyncSession, skills: dict[int, List[str]]) -> None:
+    await db.execute(
+        update(PositionsSkills),
+        [
+            {"id": position_id, "skills": position_skills, "skills_pending": False}
+            for position_id, position_skills in skills.items()
+        ],
+    )
+    await db.commit()
+
+
+## {id: (attempts, retry_at)} for failed pairs; a None retry_at gives the pair up with no skills
+async def record_skill_failures(
+    db: AsyncSession, failures: dict[int, tuple[int, datetime.datetime | None]]
+) -> None:
+    await db.execute(
+        update(PositionsSkills),
+        [
+            {
+                "id": position_id,
+                "skills_attempts": attempts,
+                "skills_retry_at": retry_at,
+                "skills_pending": retry_at is not None,
+            }
+            for position_id, (attempts, retry_at) in failures.items()
+        ],
+    )
+    await db.commit()
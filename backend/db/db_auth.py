@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from config.settings import DATABASE_URL
@@ -12,9 +13,43 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+## Same database through an asyncio driver, for request paths that must not block the event loop
+def to_async_url(url: str) -> str:
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+")[0]
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if dialect in ("postgresql", "postgres"):
+        # asyncpg takes "ssl" where libpq takes "sslmode"
+        return f"postgresql+asyncpg://{rest.replace('sslmode=', 'ssl=')}"
+    return url
+
+
+async_engine = create_async_engine(
+    to_async_url(DATABASE_URL),
+    pool_pre_ping=True,
+    pool_recycle=300,
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+
+## A forked worker must open its own connections, never reuse the parent's
+def dispose_engines_after_fork() -> None:
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,11 +1,27 @@
 import datetime
 
-from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    false,
+)
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
 
 
+## Naive UTC for the plain DateTime columns: asyncpg refuses aware values for them
+def utc_now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
 class Employee(Base):
     __tablename__ = "employees"
     id = Column(Integer, primary_key=True)
@@ -30,12 +46,8 @@ class ChatSession(Base):
         Integer, ForeignKey("employees.id", ondelete="CASCADE"), nullable=False
     )
     name = Column(String, default=None, nullable=True)
-    created_at = Column(
-        DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc)
-    )
-    last_active = Column(
-        DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc)
-    )
+    created_at = Column(DateTime, default=utc_now)
+    last_active = Column(DateTime, default=utc_now)
 
     user = relationship("Employee", back_populates="sessions")
     messages = relationship(
@@ -45,6 +57,16 @@ class ChatSession(Base):
         order_by="ChatHistory.id",
     )
 
+    # Sidebar listing and its keyset cursor
+    __table_args__ = (
+        Index(
+            "ix_chat_sessions_user_id_last_active",
+            "user_id",
+            last_active.desc(),
+            id.desc(),
+        ),
+    )
+
 
 class ChatHistory(Base):
     __tablename__ = "chat_history"
@@ -57,23 +79,25 @@ class ChatHistory(Base):
     content = Column(Text, nullable=False)
     source_links = Column(JSON, nullable=True)
     source_titles = Column(JSON, nullable=True)
-    created_at = Column(
-        DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc)
-    )
+    created_at = Column(DateTime, default=utc_now)
 
     session = relationship("ChatSession", back_populates="messages")
 
+    # History windows, transcript pages and session deletes
+    __table_args__ = (Index("ix_chat_history_session_id_id", "session_id", "id"),)
+
 
 class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("employees.id", ondelete="CASCADE"))
-    token = Column(String(255), unique=True, index=True)
-    expires_at = Column(DateTime(timezone=True))
-    created_at = Column(
-        DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc)
+    # One live token per user, rotated in place
+    user_id = Column(
+        Integer, ForeignKey("employees.id", ondelete="CASCADE"), unique=True, index=True
     )
+    token = Column(String(255), unique=True, index=True)
+    expires_at = Column(DateTime(timezone=True), index=True)
+    created_at = Column(DateTime, default=utc_now)
 
     user = relationship("Employee", back_populates="refresh_tokens")
 
@@ -81,8 +105,25 @@ class RefreshToken(Base):
 class PositionsSkills(Base):
     __tablename__ = "positions_skills"
     id = Column(Integer, primary_key=True)
-    position = Column(Text, unique=True, nullable=False)
+    position = Column(Text, nullable=False)
     position_level = Column(Text, nullable=False)
     skills = Column(JSON, nullable=False)
+    # Set until the skill catalog worker has generated the skills
+    skills_pending = Column(
+        Boolean, nullable=False, default=False, server_default=false()
+    )
+    # Failed generations so far, and when the worker may try again
+    skills_attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    skills_retry_at = Column(DateTime, nullable=True)
 
     employees = relationship("Employee", back_populates="position_obj")
+
+    # One catalog entry per (position, level), looked up on every registration
+    __table_args__ = (
+        Index(
+            "ux_positions_skills_position_level",
+            "position",
+            "position_level",
+            unique=True,
+        ),
+    )
@@ -0,0 +1,130 @@
+import asyncio
+import datetime
+from typing import List
+
+from langchain_core.output_parsers import PydanticOutputParser
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from config.settings import (
+    SKILL_CATALOG_BATCH_SIZE,
+    SKILL_CATALOG_MAX_ATTEMPTS,
+    SKILL_CATALOG_RETRY_SECONDS,
+)
+from db.crud import (
+    get_or_create_position,
+    get_pending_positions,
+    record_skill_failures,
+    set_position_skills,
+)
+from db.db_auth import AsyncSessionLocal
+from db.models import utc_now
+from llm.registry import get_llm
+
+## Hard skills per (position, level), generated once by the LLM and kept in positions_skills.
+## Registration only records an unseen pair as pending and returns; the background worker
+## fills pending pairs in batches of concurrent LLM calls
+
+
+class PositionSkillsExtraction(BaseModel):
+    skills: List[str]
+
+
+## Catalog rows are never deleted, so a pair's id can be kept for the process lifetime
+_position_ids: dict[tuple[str, str], int] = {}
+
+
+def get_catalog_position_id(db: Session, position: str, position_level: str) -> int:
+    key = (position, position_level)
+    position_id = _position_ids.get(key)
+    if position_id is None:
+        position_id = get_or_create_position(db, position, position_level).id
+        _position_ids[key] = position_id
+    return position_id
+
+
+def skills_prompt(position: str, position_level: str) -> str:
+    return (
+        f"Generate a JSON list of hard skills for the position '{position}' at level '{position_level}'. "
+        "Include skills from lower levels for senior roles. "
+        "Focus ON tools, technologies, programming languages, frameworks, NOT on domain knowledge or soft skills (e.g. google meet is better than video conferencing). "
+        "Limit: Intern=5 skills, Junior=7, Middle=10, Senior/Team Lead=15. "
+        'Return JSON exactly like this: {"skills": ["skill1", "skill2"]}. '
+        "Do NOT include explanations, markdown, or anything else."
+    )
+
+
+## Skills for each pair, or None where the call failed and the pair should be retried.
+## An answer that does not parse is stored as no skills, so it is not asked for again
+async def generate_skills(pairs: List[tuple[str, str]]) -> List[List[str] | None]:
+    parser = PydanticOutputParser(pydantic_object=PositionSkillsExtraction)
+    responses = await get_llm().abatch(
+        [[{"role": "system", "content": skills_prompt(*pair)}] for pair in pairs],
+        config={"max_concurrency": SKILL_CATALOG_BATCH_SIZE},
+        return_exceptions=True,
+    )
+
+    results = []
+    for (position, position_level), response in zip(pairs, responses):
+        if isinstance(response, Exception):
+            print(f"Skill generation failed for {position} {position_level}:", response)
+            results.append(None)
+            continue
+        try:
+            skills = parser.parse(response.content).skills
+        except Exception as e:
+            print(f"LLM parsing failed for {position} {position_level}: {e}")
+            skills = []
+        results.append([skill.lower() for skill in skills])
+    return results
+
+
+## A failed pair waits SKILL_CATALOG_RETRY_SECONDS, doubling with each failure, and is
+## given up with no skills after SKILL_CATALOG_MAX_ATTEMPTS
+def next_retry(row) -> tuple[int, datetime.datetime | None]:
+    attempts = row.skills_attempts + 1
+    if attempts >= SKILL_CATALOG_MAX_ATTEMPTS:
+        print(
+            f"Skill generation gave up on {row.position} {row.position_level} "
+            f"after {attempts} attempts"
+        )
+        return attempts, None
+    delay = SKILL_CATALOG_RETRY_SECONDS * 2 ** (attempts - 1)
+    return attempts, utc_now() + datetime.timedelta(seconds=delay)
+
+
+## Fills one batch of pending pairs; returns how many were filled
+async def fill_pending_skills() -> int:
+    async with AsyncSessionLocal() as db:
+        pending = await get_pending_positions(db, SKILL_CATALOG_BATCH_SIZE)
+        if not pending:
+            return 0
+        skills = await generate_skills(
+            [(row.position, row.position_level) for row in pending]
+        )
+        filled = {
+            row.id: row_skills
+            for row, row_skills in zip(pending, skills)
+            if row_skills is not None
+        }
+        failed = {
+            row.id: next_retry(row)
+            for row, row_skills in zip(pending, skills)
+            if row_skills is None
+        }
+        if filled:
+            await set_position_skills(db, filled)
+        if failed:
+            await record_skill_failures(db, failed)
+        return len(filled)
+
+
+async def run_skill_catalog_worker(interval_seconds: int) -> None:
+    while True:
+        try:
+            # Keep going while full batches succeed, e.g. a whole team onboarding
+            while await fill_pending_skills() == SKILL_CATALOG_BATCH_SIZE:
+                pass
+        except Exception as e:
+            print("Skill catalog update failed:", e)
+        await asyncio.sleep(interval_seconds)
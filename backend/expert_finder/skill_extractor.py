@@ -1,10 +1,9 @@
 from typing import List
 
 from langchain_core.output_parsers import PydanticOutputParser
-from langchain_groq import ChatGroq
 from pydantic import BaseModel
 
-from config.settings import GROQ_API_KEY
+from llm.registry import get_llm
 
 
 class SkillExtraction(BaseModel):
@@ -12,7 +11,7 @@ class SkillExtraction(BaseModel):
 
 
 def skill_extractor_tool(query: str) -> List[str]:
-    llm = ChatGroq(model="llama-3.3-70b-versatile", api_key=GROQ_API_KEY)
+    llm = get_llm()
 
     prompt = (
         "Extract ONLY technical skills or relevant expertise from the user query. "
@@ -0,0 +1,32 @@
+import gc
+import os
+
+from config.settings import SERVER_WORKERS
+
+## Pre-fork serving: the app and the embedding model load once in the master and are
+## shared copy-on-write; each worker then opens its own DB, Qdrant and HTTP pools
+bind = "0.0.0.0:8000"
+workers = SERVER_WORKERS
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+# Long enough for a worker's lifespan to warm up before its first heartbeat
+timeout = 120
+graceful_timeout = 30
+
+
+def when_ready(server):
+    from rag_qa.embedding_service import preload_shared_assets
+
+    preload_shared_assets()
+    # Keep the collector from writing to, and so copying, pages shared with workers
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import torch
+
+    from db.db_auth import dispose_engines_after_fork
+
+    dispose_engines_after_fork()
+    # Workers split the cores instead of each running a full set of torch threads
+    torch.set_num_threads(max((os.cpu_count() or 1) // workers, 1))
@@ -0,0 +1,63 @@
+import threading
+
+import httpx
+from langchain_groq import ChatGroq
+
+from config.settings import (
+    GROQ_API_KEY,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_MODEL_NAME,
+)
+
+## Shared ChatGroq clients backed by keep-alive connection pools, one per configuration
+_lock = threading.Lock()
+_llms: dict[tuple, ChatGroq] = {}
+_http_client: httpx.Client | None = None
+_http_async_client: httpx.AsyncClient | None = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=60,
+    )
+
+
+def _get_http_clients() -> tuple[httpx.Client, httpx.AsyncClient]:
+    global _http_client, _http_async_client
+    if _http_client is None:
+        _http_client = httpx.Client(limits=_limits(), timeout=60)
+        _http_async_client = httpx.AsyncClient(limits=_limits(), timeout=60)
+    return _http_client, _http_async_client
+
+
+def get_llm(model: str = LLM_MODEL_NAME, **kwargs) -> ChatGroq:
+    key = (model, tuple(sorted(kwargs.items())))
+    llm = _llms.get(key)
+    if llm is None:
+        with _lock:
+            llm = _llms.get(key)
+            if llm is None:
+                http_client, http_async_client = _get_http_clients()
+                llm = ChatGroq(
+                    model=model,
+                    api_key=GROQ_API_KEY,
+                    http_client=http_client,
+                    http_async_client=http_async_client,
+                    **kwargs,
+                )
+                _llms[key] = llm
+    return llm
+
+
+async def close_llm_clients() -> None:
+    global _http_client, _http_async_client
+    with _lock:
+        _llms.clear()
+        http_client, http_async_client = _http_client, _http_async_client
+        _http_client, _http_async_client = None, None
+    if http_client is not None:
+        http_client.close()
+        await http_async_client.aclose()
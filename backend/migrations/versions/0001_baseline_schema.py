@@ -0,0 +1,104 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+The tables as they were created by hand before migrations existed. Databases that
+already have them adopt this revision as-is; empty databases get them created.
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "positions_skills" not in existing:
+        op.create_table(
+            "positions_skills",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("position", sa.Text(), nullable=False, unique=True),
+            sa.Column("position_level", sa.Text(), nullable=False),
+            sa.Column("skills", sa.JSON(), nullable=False),
+        )
+
+    if "employees" not in existing:
+        op.create_table(
+            "employees",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("full_name", sa.Text(), nullable=False),
+            sa.Column("email", sa.Text(), nullable=False, unique=True),
+            sa.Column("password", sa.Text(), nullable=False),
+            sa.Column("department", sa.Text(), nullable=False),
+            sa.Column(
+                "position_id",
+                sa.Integer(),
+                sa.ForeignKey("positions_skills.id", ondelete="SET NULL"),
+                nullable=True,
+            ),
+        )
+
+    if "chat_sessions" not in existing:
+        op.create_table(
+            "chat_sessions",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column(
+                "user_id",
+                sa.Integer(),
+                sa.ForeignKey("employees.id", ondelete="CASCADE"),
+                nullable=False,
+            ),
+            sa.Column("name", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("last_active", sa.DateTime()),
+        )
+
+    if "chat_history" not in existing:
+        op.create_table(
+            "chat_history",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column(
+                "session_id",
+                sa.Integer(),
+                sa.ForeignKey("chat_sessions.id", ondelete="CASCADE"),
+                nullable=False,
+            ),
+            sa.Column("role", sa.String(), nullable=False),
+            sa.Column("content", sa.Text(), nullable=False),
+            sa.Column("source_links", sa.JSON(), nullable=True),
+            sa.Column("source_titles", sa.JSON(), nullable=True),
+            sa.Column("created_at", sa.DateTime()),
+        )
+
+    if "refresh_tokens" not in existing:
+        op.create_table(
+            "refresh_tokens",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column(
+                "user_id",
+                sa.Integer(),
+                sa.ForeignKey("employees.id", ondelete="CASCADE"),
+            ),
+            sa.Column("token", sa.String(255)),
+            sa.Column("expires_at", sa.DateTime(timezone=True)),
+            sa.Column("created_at", sa.DateTime()),
+        )
+        op.create_index("ix_refresh_tokens_id", "refresh_tokens", ["id"])
+        op.create_index(
+            "ix_refresh_tokens_token", "refresh_tokens", ["token"], unique=True
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("refresh_tokens")
+    op.drop_table("chat_history")
+    op.drop_table("chat_sessions")
+    op.drop_table("employees")
+    op.drop_table("positions_skills")
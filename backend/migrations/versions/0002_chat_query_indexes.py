@@ -0,0 +1,36 @@
+"""indexes for the chat and token queries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Session lists filter on user_id and sort by (last_active, id) descending; history
+windows, transcript pages and session deletes filter on session_id and order by id;
+refresh-token rotation deletes by user_id.
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_chat_sessions_user_id_last_active",
+        "chat_sessions",
+        ["user_id", sa.text("last_active DESC"), sa.text("id DESC")],
+    )
+    op.create_index(
+        "ix_chat_history_session_id_id", "chat_history", ["session_id", "id"]
+    )
+    op.create_index("ix_refresh_tokens_user_id", "refresh_tokens", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_refresh_tokens_user_id", table_name="refresh_tokens")
+    op.drop_index("ix_chat_history_session_id_id", table_name="chat_history")
+    op.drop_index("ix_chat_sessions_user_id_last_active", table_name="chat_sessions")
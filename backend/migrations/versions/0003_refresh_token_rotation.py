@@ -0,0 +1,38 @@
+"""one refresh token per user, indexed expiry
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Login already replaced a user's token; a unique user_id lets it do so with one upsert.
+Older duplicates are dropped, keeping each user's newest token. expires_at is indexed
+for the expiry sweeper.
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        sa.text(
+            "DELETE FROM refresh_tokens WHERE user_id IS NULL OR id NOT IN "
+            "(SELECT MAX(id) FROM refresh_tokens GROUP BY user_id)"
+        )
+    )
+    op.drop_index("ix_refresh_tokens_user_id", table_name="refresh_tokens")
+    op.create_index(
+        "ix_refresh_tokens_user_id", "refresh_tokens", ["user_id"], unique=True
+    )
+    op.create_index("ix_refresh_tokens_expires_at", "refresh_tokens", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_refresh_tokens_expires_at", table_name="refresh_tokens")
+    op.drop_index("ix_refresh_tokens_user_id", table_name="refresh_tokens")
+    op.create_index("ix_refresh_tokens_user_id", "refresh_tokens", ["user_id"])
@@ -0,0 +1,62 @@
+"""position skill catalog keyed by (position, level)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+position alone was unique, so a second level of an existing position could not be
+registered. The catalog is now unique on (position, position_level), and rows whose
+skills are still being generated in the background carry skills_pending.
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+## SQLite reports the inline UNIQUE(position) without a name; batch mode names it by this
+NAMING_CONVENTION = {"uq": "uq_%(table_name)s_%(column_0_name)s"}
+
+
+def position_unique_name() -> str | None:
+    for constraint in sa.inspect(op.get_bind()).get_unique_constraints(
+        "positions_skills"
+    ):
+        if constraint["column_names"] == ["position"]:
+            return constraint["name"] or "uq_positions_skills_position"
+    return None
+
+
+def upgrade() -> None:
+    unique_name = position_unique_name()
+    with op.batch_alter_table(
+        "positions_skills", naming_convention=NAMING_CONVENTION
+    ) as batch:
+        if unique_name:
+            batch.drop_constraint(unique_name, type_="unique")
+        batch.add_column(
+            sa.Column(
+                "skills_pending",
+                sa.Boolean(),
+                nullable=False,
+                server_default=sa.false(),
+            )
+        )
+    op.create_index(
+        "ux_positions_skills_position_level",
+        "positions_skills",
+        ["position", "position_level"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ux_positions_skills_position_level", table_name="positions_skills")
+    with op.batch_alter_table(
+        "positions_skills", naming_convention=NAMING_CONVENTION
+    ) as batch:
+        batch.drop_column("skills_pending")
+        batch.create_unique_constraint("uq_positions_skills_position", ["position"])
@@ -0,0 +1,34 @@
+"""position skill generation retries
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+A pair whose skill generation kept failing stayed pending and was picked first on every
+round. skills_attempts counts the failures and skills_retry_at holds the pair back until
+its backoff has passed.
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("positions_skills") as batch:
+        batch.add_column(
+            sa.Column(
+                "skills_attempts", sa.Integer(), nullable=False, server_default="0"
+            )
+        )
+        batch.add_column(sa.Column("skills_retry_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("positions_skills") as batch:
+        batch.drop_column("skills_retry_at")
+        batch.drop_column("skills_attempts")
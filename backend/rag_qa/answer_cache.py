@@ -0,0 +1,133 @@
+import time
+import uuid
+from typing import Any
+
+from qdrant_client import models
+
+from config.settings import (
+    ANSWER_CACHE_COLLECTION,
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS,
+)
+from rag_qa.embedding_service import (
+    encode_query,
+    get_async_qdrant_client,
+    get_qdrant_client,
+)
+
+NO_INFORMATION_ANSWER = "There is no information in the provided documents"
+
+
+## Semantic cache of answers per space, stored as question vectors in its own collection
+def ensure_answer_cache_collection() -> None:
+    if not ANSWER_CACHE_ENABLED:
+        return
+    client = get_qdrant_client()
+    if client.collection_exists(ANSWER_CACHE_COLLECTION):
+        return
+    client.create_collection(
+        collection_name=ANSWER_CACHE_COLLECTION,
+        vectors_config=models.VectorParams(
+            size=len(encode_query("warm up")), distance=models.Distance.COSINE
+        ),
+    )
+    client.create_payload_index(
+        ANSWER_CACHE_COLLECTION, "space_key", models.PayloadSchemaType.KEYWORD
+    )
+    client.create_payload_index(
+        ANSWER_CACHE_COLLECTION, "page_ids", models.PayloadSchemaType.KEYWORD
+    )
+    client.create_payload_index(
+        ANSWER_CACHE_COLLECTION, "created_at", models.PayloadSchemaType.FLOAT
+    )
+
+
+async def lookup_answer(space_key: str, vector: list[float]) -> dict[str, Any] | None:
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    try:
+        response = await get_async_qdrant_client().query_points(
+            collection_name=ANSWER_CACHE_COLLECTION,
+            query=vector,
+            query_filter=models.Filter(
+                must=[
+                    models.FieldCondition(
+                        key="space_key", match=models.MatchValue(value=space_key)
+                    ),
+                    models.FieldCondition(
+                        key="created_at",
+                        range=models.Range(gte=time.time() - ANSWER_CACHE_TTL_SECONDS),
+                    ),
+                ]
+            ),
+            score_threshold=ANSWER_CACHE_SIMILARITY_THRESHOLD,
+            limit=1,
+            with_payload=True,
+        )
+    except Exception as e:
+        print("Answer cache lookup failed:", e)
+        return None
+    if not response.points:
+        return None
+    return response.points[0].payload
+
+
+async def store_answer(
+    space_key: str,
+    question: str,
+    vector: list[float],
+    answer: str,
+    source_links: list[str],
+    source_titles: list[str],
+    page_ids: list[str],
+) -> None:
+    if not ANSWER_CACHE_ENABLED or not answer or NO_INFORMATION_ANSWER in answer:
+        return
+    try:
+        await get_async_qdrant_client().upsert(
+            collection_name=ANSWER_CACHE_COLLECTION,
+            points=[
+                models.PointStruct(
+                    id=str(uuid.uuid4()),
+                    vector=vector,
+                    payload={
+                        "space_key": space_key,
+                        "question": question,
+                        "answer": answer,
+                        "links": source_links,
+                        "titles": source_titles,
+                        "page_ids": page_ids,
+                        "created_at": time.time(),
+                    },
+                )
+            ],
+        )
+    except Exception as e:
+        print("Answer cache store failed:", e)
+
+
+## Drop cached answers built from pages that were reindexed
+def invalidate_pages(page_ids: list[str]) -> None:
+    client = get_qdrant_client()
+    if not page_ids or not client.collection_exists(ANSWER_CACHE_COLLECTION):
+        return
+    client.delete(
+        collection_name=ANSWER_CACHE_COLLECTION,
+        points_selector=models.FilterSelector(
+            filter=models.Filter(
+                must=[
+                    models.FieldCondition(
+                        key="page_ids", match=models.MatchAny(any=page_ids)
+                    )
+                ]
+            )
+        ),
+    )
+
+
+def clear_answer_cache() -> None:
+    client = get_qdrant_client()
+    if client.collection_exists(ANSWER_CACHE_COLLECTION):
+        client.delete_collection(ANSWER_CACHE_COLLECTION)
+    ensure_answer_cache_collection()
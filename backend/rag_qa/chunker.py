@@ -1,26 +1,338 @@
+import hashlib
 import re
+import uuid
+from typing import Callable
 
+from config.settings import CHUNK_MAX_TOKENS, CHUNK_MIN_TOKENS, CHUNK_OVERLAP_TOKENS
+from rag_qa.embedding_service import count_tokens as model_token_counts
 
-def chunk_text(text: str) -> list[str]:
-    chunks = re.split(r"(?=\n## )", text)
-    return [chunk.strip() for chunk in chunks if chunk.strip()]
+TokenCounter = Callable[[list[str]], list[int]]
 
+HEADING_RE = re.compile(r"^(#{1,6}) (.+)$")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+FENCE = "```"
 
-def chunk_and_prepare_metadata(documents: list[dict[str, str]]):
+
+## Memoised token lengths; unknown texts are counted together in one call
+class TokenCounts:
+    def __init__(self, count_tokens: TokenCounter):
+        self.count_tokens = count_tokens
+        self.counts: dict[str, int] = {}
+
+    def get(self, texts: list[str]) -> list[int]:
+        missing = list(dict.fromkeys(t for t in texts if t not in self.counts))
+        if missing:
+            self.counts.update(zip(missing, self.count_tokens(missing)))
+        return [self.counts[t] for t in texts]
+
+
+## Markdown lines grouped into blocks: a fenced code block or a table stays whole
+def split_blocks(text: str) -> list[str]:
+    lines = text.split("\n")
+    blocks = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith(FENCE):
+            end = i + 1
+            while end < len(lines) and not lines[end].startswith(FENCE):
+                end += 1
+            blocks.append("\n".join(lines[i : end + 1]))
+            i = end + 1
+        elif line.startswith("|"):
+            end = i
+            while end < len(lines) and lines[end].startswith("|"):
+                end += 1
+            blocks.append("\n".join(lines[i:end]))
+            i = end
+        else:
+            if line.strip():
+                blocks.append(line.rstrip())
+            i += 1
+    return blocks
+
+
+## Heading tree; each section's own blocks start with its heading line
+def parse_sections(text: str) -> dict:
+    root = {"title": None, "level": 0, "blocks": [], "children": []}
+    stack = [root]
+    for block in split_blocks(text):
+        match = HEADING_RE.match(block)
+        if not match:
+            stack[-1]["blocks"].append(block)
+            continue
+        level = len(match.group(1))
+        while stack[-1]["level"] >= level:
+            stack.pop()
+        section = {
+            "title": match.group(2).strip(),
+            "level": level,
+            "blocks": [block],
+            "children": [],
+        }
+        stack[-1]["children"].append(section)
+        stack.append(section)
+    return root
+
+
+def flatten(section: dict) -> list[str]:
+    blocks = list(section["blocks"])
+    for child in section["children"]:
+        blocks.extend(flatten(child))
+    return blocks
+
+
+## Greedy packing into index groups, carrying trailing units forward as overlap
+def pack(counts: list[int], budget: int, overlap: int = 0) -> list[list[int]]:
+    groups = []
+    current: list[int] = []
+    size = 0
+    for i, count in enumerate(counts):
+        if current and size + count > budget:
+            groups.append(current)
+            tail: list[int] = []
+            tail_size = 0
+            # The first unit never carries over, so a chunk is never repeated whole
+            for j in reversed(current[1:]):
+                if (
+                    tail_size + counts[j] > overlap
+                    or tail_size + counts[j] + count > budget
+                ):
+                    break
+                tail.insert(0, j)
+                tail_size += counts[j]
+            current, size = tail, tail_size
+        current.append(i)
+        size += count
+    if current:
+        groups.append(current)
+    return groups
+
+
+def pack_units(
+    units: list[str], tokens: TokenCounts, budget: int, sep: str, overlap: int
+) -> list[str]:
+    counts = tokens.get(units)
+    return [
+        sep.join(units[i] for i in group) for group in pack(counts, budget, overlap)
+    ]
+
+
+## Sentences first, then words for a sentence that is still too long
+def split_paragraph(
+    block: str, tokens: TokenCounts, budget: int, overlap: int
+) -> list[str]:
+    pieces = []
+    sentences = [s for s in SENTENCE_RE.split(block) if s]
+    for sentence, count in zip(sentences, tokens.get(sentences)):
+        if count <= budget:
+            pieces.append(sentence)
+        else:
+            pieces.extend(pack_units(sentence.split(), tokens, budget, " ", overlap))
+    return pack_units(pieces, tokens, budget, " ", overlap)
+
+
+## Row groups, each repeating the header so every piece is a valid table
+def split_table(
+    block: str, tokens: TokenCounts, budget: int, overlap: int
+) -> list[str]:
+    lines = block.split("\n")
+    header = "\n".join(lines[:2])
+    rows = lines[2:]
+    if not rows:
+        return split_paragraph(block, tokens, budget, overlap)
+    room = max(budget - tokens.get([header])[0], 1)
+    return [
+        f"{header}\n{part}" for part in pack_units(rows, tokens, room, "\n", overlap)
+    ]
+
+
+## Line groups, each re-opening and closing the fence with the same language
+def split_code(block: str, tokens: TokenCounts, budget: int, overlap: int) -> list[str]:
+    lines = block.split("\n")
+    opening = lines[0]
+    body = lines[1:-1] if len(lines) > 1 and lines[-1].startswith(FENCE) else lines[1:]
+    body = [line for line in body if line.strip()]
+    if not body:
+        return [block]
+    room = max(budget - tokens.get([f"{opening}\n{FENCE}"])[0], 1)
+    return [
+        f"{opening}\n{part}\n{FENCE}"
+        for part in pack_units(body, tokens, room, "\n", overlap)
+    ]
+
+
+def split_block(
+    block: str, tokens: TokenCounts, budget: int, overlap: int
+) -> list[str]:
+    if block.startswith(FENCE):
+        return split_code(block, tokens, budget, overlap)
+    if block.startswith("|"):
+        return split_table(block, tokens, budget, overlap)
+    return split_paragraph(block, tokens, budget, overlap)
+
+
+## A section's own blocks packed to the budget, oversized blocks split first
+def pack_blocks(
+    blocks: list[str], tokens: TokenCounts, max_tokens: int, overlap_tokens: int
+) -> list[tuple[list[str], int]]:
+    units = []
+    for block, count in zip(blocks, tokens.get(blocks)):
+        units.extend(
+            [block]
+            if count <= max_tokens
+            else split_block(block, tokens, max_tokens, overlap_tokens)
+        )
+    counts = tokens.get(units)
+    return [
+        ([units[i] for i in group], sum(counts[i] for i in group))
+        for group in pack(counts, max_tokens, overlap_tokens)
+    ]
+
+
+## A section that fits is one chunk; otherwise its own text and subsections split apart
+def chunk_section(
+    section: dict,
+    headings: list[str],
+    tokens: TokenCounts,
+    max_tokens: int,
+    overlap_tokens: int,
+) -> list[dict]:
+    # Text before the first heading is rare, so a page's top heading usually holds it all
+    if not section["blocks"] and len(section["children"]) == 1:
+        return chunk_section(
+            section["children"][0], headings, tokens, max_tokens, overlap_tokens
+        )
+    if section["title"]:
+        headings = headings + [section["title"]]
+
+    blocks = flatten(section)
+    total = sum(tokens.get(blocks))
+    if total <= max_tokens:
+        return (
+            [{"blocks": blocks, "headings": headings, "token_count": total}]
+            if blocks
+            else []
+        )
+
+    # The heading line leads every chunk of the section's own text, never one of its own
+    heading = section["blocks"][:1] if section["title"] else []
+    body = section["blocks"][len(heading) :]
+    heading_count = sum(tokens.get(heading))
+    chunks = [
+        {
+            "blocks": heading + part,
+            "headings": headings,
+            "token_count": heading_count + count,
+        }
+        for part, count in pack_blocks(
+            body, tokens, max(max_tokens - heading_count, 1), overlap_tokens
+        )
+    ]
+    for child in section["children"]:
+        chunks.extend(
+            chunk_section(child, headings, tokens, max_tokens, overlap_tokens)
+        )
+    return chunks
+
+
+def common_headings(a: list[str], b: list[str]) -> list[str]:
+    shared = []
+    for left, right in zip(a, b):
+        if left != right:
+            break
+        shared.append(left)
+    return shared
+
+
+## Undersized chunks join the next chunk, or the previous one, when the result fits
+def merge_small(chunks: list[dict], min_tokens: int, max_tokens: int) -> list[dict]:
+    merged: list[dict] = []
+    pending = None
+    for chunk in chunks:
+        if pending:
+            if pending["token_count"] + chunk["token_count"] <= max_tokens:
+                chunk = {
+                    "blocks": pending["blocks"] + chunk["blocks"],
+                    "headings": common_headings(pending["headings"], chunk["headings"]),
+                    "token_count": pending["token_count"] + chunk["token_count"],
+                }
+            else:
+                merged.append(pending)
+            pending = None
+        if chunk["token_count"] < min_tokens:
+            pending = chunk
+        else:
+            merged.append(chunk)
+
+    if pending:
+        previous = merged[-1] if merged else None
+        if previous and previous["token_count"] + pending["token_count"] <= max_tokens:
+            merged[-1] = {
+                "blocks": previous["blocks"] + pending["blocks"],
+                "headings": common_headings(previous["headings"], pending["headings"]),
+                "token_count": previous["token_count"] + pending["token_count"],
+            }
+        else:
+            merged.append(pending)
+    return merged
+
+
+def chunk_text(
+    text: str,
+    count_tokens: TokenCounter | None = None,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    min_tokens: int = CHUNK_MIN_TOKENS,
+) -> list[dict[str, str | list[str] | int]]:
+    tokens = TokenCounts(count_tokens or model_token_counts)
+    root = parse_sections(text)
+    # Every block is counted up front in a single tokenizer call
+    tokens.get(flatten(root))
+
+    chunks = chunk_section(root, [], tokens, max_tokens, overlap_tokens)
+    return [
+        {
+            "text": "\n".join(chunk["blocks"]).strip(),
+            "headings": chunk["headings"],
+            "token_count": chunk["token_count"],
+        }
+        for chunk in merge_small(chunks, min_tokens, max_tokens)
+    ]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+## Stable point id, so re-indexing a page overwrites its chunks in place
+def chunk_point_id(page_id: str, chunk_index: int) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"confluence:{page_id}:{chunk_index}"))
+
+
+def chunk_and_prepare_metadata(
+    documents: list[dict[str, str]], count_tokens: TokenCounter | None = None
+):
     chunks = []
     metadata = []
 
     for doc in documents:
-        chunked_text = chunk_text(doc["text"])
+        chunked_text = chunk_text(doc["text"], count_tokens)
 
         for idx, chunk in enumerate(chunked_text):
-            chunks.append(chunk)
+            chunks.append(chunk["text"])
             metadata.append(
                 {
                     "page_title": doc["title"],
                     "page_link": doc["link"],
+                    "space_key": doc["space_key"],
+                    "page_id": doc["page_id"],
+                    "page_version": doc.get("version"),
+                    "content_hash": content_hash(chunk["text"]),
                     "chunk_index": idx,
                     "total_chunks": len(chunked_text),
+                    "headings": chunk["headings"],
+                    "token_count": chunk["token_count"],
                 }
             )
 
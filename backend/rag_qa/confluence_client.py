@@ -1,242 +1,292 @@
-from typing import Any
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, Iterator
 
 import requests
-from bs4 import BeautifulSoup, Tag
+from bs4 import BeautifulSoup
 from requests.auth import HTTPBasicAuth
 
-from config.settings import CONFLUENCE_API_TOKEN, CONFLUENCE_DOMAIN, CONFLUENCE_USERNAME
+from config.settings import (
+    CONFLUENCE_API_TOKEN,
+    CONFLUENCE_DOMAIN,
+    CONFLUENCE_MAX_RETRIES,
+    CONFLUENCE_MAX_WORKERS,
+    CONFLUENCE_PAGE_LIMIT,
+    CONFLUENCE_USERNAME,
+    LOCAL_DATA_DIR,
+)
+from rag_qa.content_store import load_page, save_page
+from rag_qa.storage_converter import (
+    CONVERTER_VERSION,
+    collect_account_ids,
+    extract_text_and_images,
+)
+
+RETRY_STATUS_CODES = {429, 503}
+USER_BULK_LIMIT = 100
+USER_DIRECTORY_PATH = os.path.join(LOCAL_DATA_DIR, "confluence_users.json")
+
+
+## Confluence could not answer; index jobs stop rather than act on a partial crawl
+class ConfluenceError(Exception):
+    pass
+
+
+## One keep-alive session per crawler thread
+_thread_local = threading.local()
+
+
+def _get_session() -> requests.Session:
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.auth = HTTPBasicAuth(CONFLUENCE_USERNAME, CONFLUENCE_API_TOKEN)
+        _thread_local.session = session
+    return session
+
+
+def _retry_delay(response: requests.Response | None, attempt: int) -> float:
+    retry_after = (
+        response.headers.get("Retry-After", "") if response is not None else ""
+    )
+    if retry_after.isdigit():
+        return float(retry_after)
+    return float(2**attempt)
+
+
+## GET with backoff on rate limiting (honouring Retry-After) and on dropped or timed-out
+## connections; the last transport error is raised once the retries run out
+def confluence_get(url: str, params: dict | None = None) -> requests.Response:
+    for attempt in range(CONFLUENCE_MAX_RETRIES + 1):
+        try:
+            response = _get_session().get(url, params=params, timeout=30)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == CONFLUENCE_MAX_RETRIES:
+                raise
+            print("Confluence request failed, retrying:", url, e)
+            time.sleep(_retry_delay(None, attempt))
+            continue
+        if (
+            response.status_code not in RETRY_STATUS_CODES
+            or attempt == CONFLUENCE_MAX_RETRIES
+        ):
+            return response
+        time.sleep(_retry_delay(response, attempt))
+    return response
+
+
+## Follow start/limit pagination; None if any page of results fails, so callers never act on a partial list
+def get_all_results(url: str, params: dict | None = None) -> list | None:
+    results = []
+    start = 0
+    while True:
+        response = confluence_get(
+            url, {**(params or {}), "start": start, "limit": CONFLUENCE_PAGE_LIMIT}
+        )
+        if response.status_code != 200:
+            print("Error fetching", url, response.status_code, response.text)
+            return None
+        data = response.json()
+        batch = data.get("results", [])
+        results.extend(batch)
+        if not batch or "next" not in data.get("_links", {}):
+            return results
+        start += len(batch)
+
+
+def _list_space_pages(space_key: str) -> list:
+    url = f"https://{CONFLUENCE_DOMAIN}/wiki/rest/api/space/{space_key}/content/page"
+    result = get_all_results(url, {"expand": "version"})
+    if result is None:
+        raise ConfluenceError(f"Could not list the pages of space {space_key}")
+    return [
+        {
+            "id": page["id"],
+            "title": page["title"],
+            "version": page.get("version", {}).get("number"),
+        }
+        for page in result
+    ]
 
 
 ## Fetch public titles of pages (for all employees)
 def get_public_titles() -> list:
-    url = f"https://{CONFLUENCE_DOMAIN}/wiki/rest/api/space/PUBLIC/content/page"
-    auth = HTTPBasicAuth(CONFLUENCE_USERNAME, CONFLUENCE_API_TOKEN)
-    response = requests.get(url, auth=auth)
-    if response.status_code == 200:
-        result = response.json().get("results", [])
-        pages = [{"id": page["id"], "title": page["title"]} for page in result]
-        return pages
-    else:
-        print("Error fetching public pages:", response.status_code, response.text)
-        return []
+    return _list_space_pages("PUBLIC")
 
 
 ## Fetch only titles for a specific department/space
 def get_available_titles(space_key: str) -> list:
-    url = f"https://{CONFLUENCE_DOMAIN}/wiki/rest/api/space/{space_key}/content/page"
-    auth = HTTPBasicAuth(CONFLUENCE_USERNAME, CONFLUENCE_API_TOKEN)
-    response = requests.get(url, auth=auth)
-    if response.status_code == 200:
-        result = response.json().get("results", [])
-        pages = [{"id": page["id"], "title": page["title"]} for page in result]
-        return [page for page in pages if page["title"] != "Main Page"]
-    else:
-        print("Error fetching pages:", response.status_code, response.text)
-        return []
-
-
-## Fetch and process page
-def get_content_of_page(page_id: str) -> dict[str, str | list[Any]] | None:
-    url = f"https://{CONFLUENCE_DOMAIN}/wiki/rest/api/content/{page_id}?expand=body.storage"
-    auth = HTTPBasicAuth(CONFLUENCE_USERNAME, CONFLUENCE_API_TOKEN)
-    response = requests.get(url, auth=auth)
+    pages = _list_space_pages(space_key)
+    return [page for page in pages if page["title"] != "Main Page"]
+
+
+## Parsed page, and whether every mention was resolved; an incomplete parse is not stored,
+## so a failed user lookup is retried on the next crawl instead of indexed for good
+def parse_storage(
+    content: str, page_id: str
+) -> tuple[dict[str, str | list[Any]], bool]:
+    soup = BeautifulSoup(content, "html.parser")
+    user_names, complete = resolve_user_names(collect_account_ids(soup))
+    return extract_text_and_images(soup, page_id, user_names), complete
+
+
+## Fetch and process page, reading through the local content store when the version is known
+def get_content_of_page(
+    page_id: str, version: int | None = None
+) -> dict[str, str | list[Any]] | None:
+    if version is not None:
+        stored = load_page(page_id, version)
+        if stored:
+            if stored["converter_version"] != CONVERTER_VERSION:
+                parsed, complete = parse_storage(stored["storage"], page_id)
+                stored.update(parsed)
+                if complete:
+                    save_page(
+                        page_id, version, stored["storage"], stored, CONVERTER_VERSION
+                    )
+            return {"text": stored["text"], "images": stored["images"]}
+
+    url = f"https://{CONFLUENCE_DOMAIN}/wiki/rest/api/content/{page_id}"
+    response = confluence_get(url, {"expand": "body.storage,version"})
     if response.status_code == 200:
         data = response.json()
         content = data["body"]["storage"]["value"]
-        soup = BeautifulSoup(content, "html.parser")
-        formated_content = extract_text_and_images(soup, page_id)
+        formated_content, complete = parse_storage(content, page_id)
+        fetched_version = data.get("version", {}).get("number")
+        if fetched_version is not None and complete:
+            save_page(
+                page_id, fetched_version, content, formated_content, CONVERTER_VERSION
+            )
         return formated_content
-    else:
-        print("Error fetching content:", response.status_code, response.text)
+    # Deleted since it was listed
+    if response.status_code == 404:
         return None
+    raise ConfluenceError(
+        f"Could not fetch page {page_id}: {response.status_code} {response.text}"
+    )
 
 
 ## Fetch all space keys in the Confluence domain
 def get_all_spaces() -> list:
     url = f"https://{CONFLUENCE_DOMAIN}/wiki/rest/api/space"
-    auth = HTTPBasicAuth(CONFLUENCE_USERNAME, CONFLUENCE_API_TOKEN)
-    response = requests.get(url, auth=auth)
-    if response.status_code == 200:
-        result = response.json().get("results", [])
-        spaces = [{"key": space["key"], "name": space["name"]} for space in result]
-        return spaces
-    else:
-        print("Error fetching spaces:", response.status_code, response.text)
-        return []
-
-
-## Fetch all pages across all spaces for vector database building
-def get_all_pages() -> list:
-    pages = []
+    result = get_all_results(url)
+    if result is None:
+        raise ConfluenceError("Could not list the Confluence spaces")
+    return [{"key": space["key"], "name": space["name"]} for space in result]
+
+
+## Run fn over items on the pool, keeping at most `window` calls in flight and yielding results as they finish
+def _bounded_map(
+    pool: ThreadPoolExecutor, fn: Callable, items: Iterable[tuple], window: int
+) -> Iterator:
+    pending = set()
+    for args in items:
+        pending.add(pool.submit(fn, *args))
+        if len(pending) >= window:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+
+## Crawl all pages across all spaces concurrently, yielding documents as they arrive
+def iter_all_pages() -> Iterator[dict]:
     spaces = get_all_spaces()
-    for space in spaces:
-        available_titles = get_available_titles(space["key"])
-        page_titles = [page["title"] for page in available_titles]
-        page_link = [
-            f"https://{CONFLUENCE_DOMAIN}/wiki/spaces/{space['key']}/pages/{page['id']}"
-            for page in available_titles
-        ]
-        page_text = [
-            content["text"]
-            for content in [
-                get_content_of_page(page["id"]) for page in available_titles
-            ]
-            if content
-        ]
-        pages.extend(
-            [
-                {"title": title, "link": link, "text": text}
-                for title, link, text in zip(page_titles, page_link, page_text)
-            ]
+    with ThreadPoolExecutor(max_workers=CONFLUENCE_MAX_WORKERS) as pool:
+        listings = _bounded_map(
+            pool,
+            lambda key: (key, get_available_titles(key)),
+            [(space["key"],) for space in spaces],
+            CONFLUENCE_MAX_WORKERS,
         )
-    return pages
-
-
-## Parse HTML content from Confluence API to transform into plain text for LLM and extract images
-def extract_text_and_images(
-    soup: BeautifulSoup, page_id: str
-) -> dict[str, str | list[str]]:
-    texts = []
-    images = []
-
-    def recurse(elem: Tag) -> None:
-        for child in elem.children:
-            if not isinstance(child, Tag):
-                continue
-
-            if child.name in ["h1", "h2", "h3", "h4", "h5", "h6"]:
-                text = child.get_text(strip=True)
-                if text:
-                    heading = int(child.name[1])
-                    texts.append("\n" + "#" * heading + f" {text}\n")
-
-            elif child.name == "p":
-                text = format_inline(child)
-                if text:
-                    texts.append(text)
-
-            elif child.name == "ol":
-                for idx, li in enumerate(
-                    child.find_all("li", recursive=False), start=1
-                ):
-                    li_text = format_inline(li)
-                    if li_text:
-                        texts.append(f"{idx}. {li_text}")
-
-            elif child.name == "ul":
-                for li in child.find_all("li", recursive=False):
-                    li_text = format_inline(li)
-                    if li_text:
-                        texts.append(f"- {li_text}")
-
-            elif child.name == "table":
-                table_text = extract_table(child)
-                if table_text:
-                    texts.append(f"{table_text}\n")
-
-            elif child.name == "ac:structured-macro" and child.get("ac:name") == "code":
-                code_text = extract_code_block(child)
-                if code_text:
-                    texts.append(code_text)
-
-            elif "emoticon" in (child.name or ""):
-                emoji_name = child.get("ac:emoji-shortname", "").strip(":")
-                if emoji_name:
-                    texts.append(f":{emoji_name}:")
-
-            elif child.name in ["ac:image", "img"]:
-                url = None
-                caption = None
-
-                if child.name == "img":
-                    if child.get("src"):
-                        url = child["src"]
-                    if child.get("alt"):
-                        caption = child["alt"]
-
-                elif child.name == "ac:image":
-                    ri = child.find("ri:attachment")
-                    if ri and ri.get("ri:filename"):
-                        filename = ri["ri:filename"]
-                        url = f"https://{CONFLUENCE_DOMAIN}/wiki/download/attachments/{page_id}/{filename}"
-
-                    cap = child.find("ac:caption")
-                    if cap and cap.get_text(strip=True):
-                        caption = cap.get_text(strip=True)
-
-                if url:
-                    entry = f"[Image: {url}]"
-                    if caption:
-                        entry = f"[Image ({caption}): {url}]"
-                    texts.append(entry)
-                    images.append(url)
-
-            elif child.name in ["script", "style"]:
-                continue
-
-            elif hasattr(child, "children"):
-                recurse(child)
-
-    def format_inline(tag: Tag) -> str:
-        s = tag.decode_contents()
-        for b in tag.find_all(["strong", "b"]):
-            b_text = b.get_text(strip=True)
-            s = s.replace(b_text, f"**{b_text}**")
-        for i in tag.find_all(["em", "i"]):
-            i_text = i.get_text(strip=True)
-            s = s.replace(i_text, f"*{i_text}*")
-        for c in tag.find_all("code"):
-            c_text = c.get_text(strip=True)
-            s = s.replace(c_text, f"`{c_text}`")
-        for emo in tag.find_all(lambda t: "emoticon" in (t.name or "")):
-            short = emo.get("ac:emoji-shortname", "").strip(":")
-            if short:
-                s = s.replace(str(emo), f":{short}:")
-        for link in tag.find_all("a", href=True):
-            link_text = link.get_text(strip=True)
-            link_url = link["href"]
-            s = s.replace(str(link), f"[{link_text}: {link_url}]")
-        for link in tag.find_all("ac:link"):
-            user_tag = link.find("ri:user")
-            if user_tag:
-                account_id = user_tag.get("ri:account-id")
-                url = f"https://{CONFLUENCE_DOMAIN}/wiki/rest/api/user"
-                params = {"accountId": account_id}
-                response = requests.get(
-                    url, params=params, auth=(CONFLUENCE_USERNAME, CONFLUENCE_API_TOKEN)
-                )
-                if response.status_code == 200:
-                    user_name = response.json().get("displayName")
-                else:
-                    user_name = "Unknown User"
-                s = s.replace(str(link), f"@{user_name}")
-        plain = BeautifulSoup(s, "html.parser").get_text()
-        return plain.strip()
-
-    def extract_table(table_tag: Tag) -> str:
-        rows = []
-        header = table_tag.find("tr")
-        if header:
-            headers = [th.get_text(strip=True) for th in header.find_all(["th", "td"])]
-            rows.append("| " + " | ".join(headers) + " |")
-            rows.append("|" + "|".join(["---"] * len(headers)) + "|")
-        for tr in table_tag.find_all("tr")[1:]:
-            cells = [td.get_text(strip=True) for td in tr.find_all(["td", "th"])]
-            if cells:
-                rows.append("| " + " | ".join(cells) + " |")
-        return "\n".join(rows)
-
-    def extract_code_block(tag: Tag) -> str | None:
-        lang_tag = tag.find("ac:parameter", {"ac:name": "language"})
-        code_tag = tag.find("ac:plain-text-body")
-        if code_tag:
-            code = code_tag.get_text()
-            lang = lang_tag.get_text(strip=True).lower() if lang_tag else ""
-            if lang:
-                return f"```{lang}\n{code}\n```"
-            else:
-                return f"\n```\n{code}\n```"
+        pages = [(key, page) for key, listing in listings for page in listing]
+        for document in _bounded_map(
+            pool, get_page_document, pages, CONFLUENCE_MAX_WORKERS * 2
+        ):
+            if document:
+                yield document
+
+
+## Fetch one listed page as a document ready for chunking
+def get_page_document(space_key: str, page: dict) -> dict | None:
+    content = get_content_of_page(page["id"], page.get("version"))
+    if not content:
         return None
-
-    recurse(soup)
-    return {"text": "\n".join(texts), "images": images}
+    return {
+        "title": page["title"],
+        "link": f"https://{CONFLUENCE_DOMAIN}/wiki/spaces/{space_key}/pages/{page['id']}",
+        "text": content["text"],
+        "space_key": space_key,
+        "page_id": page["id"],
+        "version": page.get("version"),
+    }
+
+
+## User directory: account id -> display name, kept in memory and on disk across crawls
+_user_lock = threading.Lock()
+_user_names: dict[str, str] | None = None
+# Ids the API could not resolve; remembered for this process only
+_unknown_user_ids: set[str] = set()
+
+
+def _load_user_directory() -> dict[str, str]:
+    global _user_names
+    if _user_names is None:
+        try:
+            with open(USER_DIRECTORY_PATH) as f:
+                _user_names = json.load(f)
+        except (OSError, ValueError):
+            _user_names = {}
+    return _user_names
+
+
+def _save_user_directory(user_names: dict[str, str]) -> None:
+    os.makedirs(os.path.dirname(USER_DIRECTORY_PATH), exist_ok=True)
+    tmp_path = f"{USER_DIRECTORY_PATH}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(user_names, f)
+    os.replace(tmp_path, USER_DIRECTORY_PATH)
+
+
+## Names for the given account ids, and False if a lookup request failed (the ids it
+## covered are left out, not marked unknown, so a later call asks again)
+def resolve_user_names(
+    account_ids: Iterable[str | None],
+) -> tuple[dict[str, str], bool]:
+    wanted = {account_id for account_id in account_ids if account_id}
+    with _user_lock:
+        user_names = _load_user_directory()
+        missing = sorted(wanted - user_names.keys() - _unknown_user_ids)
+
+    fetched = {}
+    unknown = set()
+    complete = True
+    url = f"https://{CONFLUENCE_DOMAIN}/wiki/rest/api/user/bulk"
+    for i in range(0, len(missing), USER_BULK_LIMIT):
+        batch = missing[i : i + USER_BULK_LIMIT]
+        response = confluence_get(url, {"accountId": batch, "limit": len(batch)})
+        if response.status_code != 200:
+            print("Error fetching users:", response.status_code, response.text)
+            complete = False
+            continue
+        for user in response.json().get("results", []):
+            fetched[user["accountId"]] = user.get("displayName", "Unknown User")
+        unknown.update(set(batch) - fetched.keys())
+
+    with _user_lock:
+        _unknown_user_ids.update(unknown)
+        if fetched:
+            user_names.update(fetched)
+            _save_user_directory(user_names)
+        names = {
+            account_id: user_names[account_id]
+            for account_id in wanted
+            if account_id in user_names
+        }
+    return names, complete
@@ -0,0 +1,56 @@
+import json
+import os
+import shutil
+
+from config.settings import LOCAL_DATA_DIR
+
+## On-disk page cache: <LOCAL_DATA_DIR>/pages/<page_id>/<version>.json holds the raw
+## storage-format body and the Markdown parsed from it
+PAGES_DIR = os.path.join(LOCAL_DATA_DIR, "pages")
+
+
+def _page_dir(page_id: str) -> str:
+    return os.path.join(PAGES_DIR, str(page_id))
+
+
+def _page_path(page_id: str, version: int) -> str:
+    return os.path.join(_page_dir(page_id), f"{version}.json")
+
+
+def load_page(page_id: str, version: int) -> dict | None:
+    try:
+        with open(_page_path(page_id, version)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+## Write atomically and drop older versions of the page
+def save_page(
+    page_id: str, version: int, storage: str, parsed: dict, converter_version: int
+) -> None:
+    page_dir = _page_dir(page_id)
+    os.makedirs(page_dir, exist_ok=True)
+    path = _page_path(page_id, version)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(
+            {
+                "page_id": page_id,
+                "version": version,
+                "storage": storage,
+                "converter_version": converter_version,
+                "text": parsed["text"],
+                "images": parsed["images"],
+            },
+            f,
+        )
+    os.replace(tmp_path, path)
+
+    for name in os.listdir(page_dir):
+        if name != os.path.basename(path):
+            os.remove(os.path.join(page_dir, name))
+
+
+def remove_page(page_id: str) -> None:
+    shutil.rmtree(_page_dir(page_id), ignore_errors=True)
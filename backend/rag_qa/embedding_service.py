@@ -0,0 +1,180 @@
+import os
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Iterator
+
+from langchain_huggingface import HuggingFaceEmbeddings
+from qdrant_client import AsyncQdrantClient, QdrantClient
+
+from config.settings import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_BUILD_BATCH_SIZE,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_PROCESSES,
+    EMBEDDING_STORE_ENABLED,
+    QDRANT_URL,
+)
+from rag_qa.embedding_store import EmbeddingStore, embed_with_store, text_key
+
+## Process-wide embedding model and Qdrant clients, created once and shared by all requests
+_lock = threading.RLock()
+_embedding: HuggingFaceEmbeddings | None = None
+_qdrant_client: QdrantClient | None = None
+_async_qdrant_client: AsyncQdrantClient | None = None
+_embedding_store: EmbeddingStore | None = None
+
+
+def get_embedding() -> HuggingFaceEmbeddings:
+    global _embedding
+    if _embedding is None:
+        with _lock:
+            if _embedding is None:
+                _embedding = HuggingFaceEmbeddings(
+                    model_name=EMBEDDING_MODEL_NAME,
+                    encode_kwargs={"batch_size": EMBEDDING_BATCH_SIZE},
+                )
+    return _embedding
+
+
+def get_qdrant_client() -> QdrantClient:
+    global _qdrant_client
+    if _qdrant_client is None:
+        with _lock:
+            if _qdrant_client is None:
+                _qdrant_client = QdrantClient(url=QDRANT_URL)
+    return _qdrant_client
+
+
+def get_async_qdrant_client() -> AsyncQdrantClient:
+    global _async_qdrant_client
+    if _async_qdrant_client is None:
+        with _lock:
+            if _async_qdrant_client is None:
+                _async_qdrant_client = AsyncQdrantClient(url=QDRANT_URL)
+    return _async_qdrant_client
+
+
+def get_embedding_store() -> EmbeddingStore | None:
+    global _embedding_store
+    if _embedding_store is None and EMBEDDING_STORE_ENABLED:
+        with _lock:
+            if _embedding_store is None:
+                _embedding_store = EmbeddingStore(
+                    EMBEDDING_MODEL_NAME, embedding_size()
+                )
+    return _embedding_store
+
+
+## Encode through the embedding store, so each distinct text is embedded only once
+def encode_stored(
+    texts: list[str], encode_fn: Callable[[list[str]], list[list[float]]]
+) -> list[list[float]]:
+    store = get_embedding_store()
+    if store is None:
+        return encode_fn(texts) if texts else []
+    return embed_with_store(store, texts, encode_fn)
+
+
+## Batch encode texts with the shared model
+def encode(texts: list[str]) -> list[list[float]]:
+    return encode_stored(texts, get_embedding().embed_documents)
+
+
+def embedding_size() -> int:
+    return get_embedding()._client.get_sentence_embedding_dimension()
+
+
+def start_pool(model, processes: int) -> dict:
+    # Workers share the cores instead of each starting a full set of torch threads
+    threads = os.environ.get("OMP_NUM_THREADS")
+    os.environ["OMP_NUM_THREADS"] = str(max((os.cpu_count() or 1) // processes, 1))
+    try:
+        return model.start_multi_process_pool(["cpu"] * processes)
+    finally:
+        if threads is None:
+            os.environ.pop("OMP_NUM_THREADS")
+        else:
+            os.environ["OMP_NUM_THREADS"] = threads
+
+
+## Bulk encoder for index builds: the query-side model, spread over worker processes
+@contextmanager
+def build_encoder(
+    processes: int = EMBEDDING_PROCESSES, batch_size: int = EMBEDDING_BUILD_BATCH_SIZE
+) -> Iterator[Callable[[list[str]], list[list[float]]]]:
+    model = get_embedding()._client
+    encode_kwargs = {
+        k: v for k, v in get_embedding().encode_kwargs.items() if k != "batch_size"
+    }
+
+    pool = None
+
+    # The pool starts on the first miss, so a rebuild served from the store never forks
+    def encode_missing(texts: list[str]) -> list[list[float]]:
+        nonlocal pool
+        if pool is None and processes > 1:
+            pool = start_pool(model, processes)
+        # Same preprocessing as HuggingFaceEmbeddings, so vectors match the query side
+        texts = [text.replace("\n", " ") for text in texts]
+        if pool is None:
+            return model.encode(texts, batch_size=batch_size, **encode_kwargs).tolist()
+        return model.encode(
+            texts,
+            pool=pool,
+            batch_size=batch_size,
+            chunk_size=batch_size,
+            **encode_kwargs,
+        ).tolist()
+
+    try:
+        yield lambda texts: encode_stored(texts, encode_missing)
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+
+
+## Recent questions are embedded by both the answer cache and the retriever
+@lru_cache(maxsize=1024)
+def _encode_query_cached(text: str) -> tuple[float, ...]:
+    # Questions are only looked up in the store; writing each one would grow it forever
+    store = get_embedding_store()
+    if store is not None:
+        vector = store.get_many([text_key(text)])[0]
+        if vector is not None:
+            return tuple(vector)
+    return tuple(get_embedding().embed_query(text))
+
+
+def encode_query(text: str) -> list[float]:
+    return list(_encode_query_cached(text))
+
+
+## Token lengths from the embedding model's own tokenizer, in one batched call
+def count_tokens(texts: list[str]) -> list[int]:
+    if not texts:
+        return []
+    tokenizer = get_embedding()._client.tokenizer
+    encoded = tokenizer(texts, add_special_tokens=False)["input_ids"]
+    return [len(ids) for ids in encoded]
+
+
+## Read-only assets for a pre-fork server: loaded once, shared copy-on-write by workers.
+## No forward pass here, so the master never starts the thread pools a fork would inherit
+def preload_shared_assets() -> None:
+    get_embedding()
+    get_embedding_store()
+
+
+## Load model weights and open the Qdrant connection before the API accepts requests
+def warm_up() -> None:
+    get_qdrant_client()
+    get_embedding().embed_query("warm up")
+    get_embedding_store()
+
+
+async def close_qdrant_clients() -> None:
+    global _async_qdrant_client
+    if _async_qdrant_client is not None:
+        await _async_qdrant_client.close()
+        _async_qdrant_client = None
@@ -0,0 +1,124 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from config.settings import LOCAL_DATA_DIR
+
+## Content-addressed vectors: <LOCAL_DATA_DIR>/embeddings/<model>/ holds vectors.f32,
+## an append-only float32 matrix, and keys.bin, the sha256 of each row's text in order
+EMBEDDINGS_DIR = os.path.join(LOCAL_DATA_DIR, "embeddings")
+DIGEST_SIZE = hashlib.sha256().digest_size
+
+
+## The tokenizer splits on whitespace, so runs of it never change the vector
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha256(normalize_text(text).encode()).digest()
+
+
+class EmbeddingStore:
+    def __init__(self, model_id: str, dim: int, root: str = EMBEDDINGS_DIR):
+        self.dim = dim
+        self.directory = os.path.join(root, model_id.replace("/", "__"))
+        self.keys_path = os.path.join(self.directory, "keys.bin")
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.rows: dict[bytes, int] = {}
+        self.count = 0
+        self.vectors: np.memmap | None = None
+        self.lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        meta_path = os.path.join(self.directory, "meta.json")
+        meta = {"model_id": model_id, "dim": dim}
+        if not os.path.exists(meta_path):
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+        else:
+            with open(meta_path) as f:
+                if json.load(f) != meta:
+                    raise ValueError(
+                        f"Embedding store {self.directory} holds another model"
+                    )
+        self.refresh()
+
+    ## Map rows appended since the last look, including ones written by other processes
+    def refresh(self) -> None:
+        try:
+            count = os.path.getsize(self.keys_path) // DIGEST_SIZE
+        except OSError:
+            return
+        if count <= self.count:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self.count * DIGEST_SIZE)
+            data = f.read((count - self.count) * DIGEST_SIZE)
+        for i in range(count - self.count):
+            key = data[i * DIGEST_SIZE : (i + 1) * DIGEST_SIZE]
+            self.rows.setdefault(key, self.count + i)
+        self.count = count
+        self.vectors = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r", shape=(count, self.dim)
+        )
+
+    def get_many(self, keys: list[bytes]) -> list[list[float] | None]:
+        with self.lock:
+            if any(key not in self.rows for key in keys):
+                self.refresh()
+            return [
+                self.vectors[self.rows[key]].tolist() if key in self.rows else None
+                for key in keys
+            ]
+
+    def put_many(self, keys: list[bytes], vectors: list[list[float]]) -> None:
+        with self.lock, open(self.keys_path, "ab") as keys_file:
+            fcntl.flock(keys_file, fcntl.LOCK_EX)
+            try:
+                self.refresh()
+                new = {}
+                for key, vector in zip(keys, vectors):
+                    if key not in self.rows:
+                        new.setdefault(key, vector)
+                if not new:
+                    return
+
+                # Vectors go first; a crash before the keys land leaves rows nobody maps,
+                # and cutting both files back to the mapped count realigns them
+                with open(self.vectors_path, "ab") as vectors_file:
+                    vectors_file.truncate(self.count * self.dim * 4)
+                    vectors_file.write(
+                        np.asarray(list(new.values()), dtype=np.float32).tobytes()
+                    )
+                keys_file.truncate(self.count * DIGEST_SIZE)
+                keys_file.write(b"".join(new))
+                keys_file.flush()
+                self.refresh()
+            finally:
+                fcntl.flock(keys_file, fcntl.LOCK_UN)
+
+
+## Vectors for texts, encoding only those the store has not seen; duplicates encode once
+def embed_with_store(store: EmbeddingStore, texts: list[str], encode_fn) -> list:
+    if not texts:
+        return []
+    keys = [text_key(text) for text in texts]
+    vectors = store.get_many(keys)
+
+    missing = {}
+    for key, text, vector in zip(keys, texts, vectors):
+        if vector is None:
+            missing.setdefault(key, text)
+    if missing:
+        encoded = dict(zip(missing, encode_fn(list(missing.values()))))
+        store.put_many(list(encoded), list(encoded.values()))
+        vectors = [
+            encoded[key] if vector is None else vector
+            for key, vector in zip(keys, vectors)
+        ]
+    return vectors
@@ -0,0 +1,211 @@
+import asyncio
+import fcntl
+import os
+import threading
+
+from qdrant_client import QdrantClient, models
+
+from config.settings import LOCAL_DATA_DIR, QDRANT_COLLECTION
+from rag_qa.answer_cache import invalidate_pages
+from rag_qa.chunker import chunk_and_prepare_metadata, chunk_point_id
+from rag_qa.confluence_client import (
+    ConfluenceError,
+    get_all_spaces,
+    get_available_titles,
+    get_page_document,
+)
+from rag_qa.content_store import remove_page
+from rag_qa.embedding_service import encode, get_qdrant_client
+
+## Held by incremental syncs and full rebuilds, so only one writes to the index at a time
+index_lock = threading.Lock()
+_jobs_lock_file = None
+
+
+## With several server workers only the one holding this file lock runs index jobs;
+## the OS drops the lock when that worker exits, so its replacement takes over
+def claim_index_jobs() -> bool:
+    global _jobs_lock_file
+    if _jobs_lock_file is not None:
+        return True
+    os.makedirs(LOCAL_DATA_DIR, exist_ok=True)
+    lock_file = open(os.path.join(LOCAL_DATA_DIR, "index_jobs.lock"), "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _jobs_lock_file = lock_file
+    return True
+
+
+## Command-line runs take the same lock, so they never overlap a server's index jobs
+def run_exclusive(job) -> None:
+    if not claim_index_jobs():
+        print("A server worker is running the index jobs; stop the server to run this")
+        raise SystemExit(1)
+    job()
+
+
+## Current index state: page_id -> version, space and {point_id: content_hash}
+def load_indexed_pages(client: QdrantClient) -> dict[str, dict]:
+    pages = {}
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=QDRANT_COLLECTION,
+            with_payload=["metadata"],
+            with_vectors=False,
+            limit=1000,
+            offset=offset,
+        )
+        for point in points:
+            meta = point.payload.get("metadata", {})
+            page = pages.setdefault(
+                meta.get("page_id"),
+                {
+                    "version": meta.get("page_version"),
+                    "space_key": meta.get("space_key"),
+                    "chunks": {},
+                },
+            )
+            page["chunks"][str(point.id)] = meta.get("content_hash")
+        if offset is None:
+            return pages
+
+
+## Re-embed only chunks whose text changed, refresh metadata on the rest, drop leftovers
+def sync_page(client: QdrantClient, document: dict, indexed_page: dict | None) -> int:
+    chunks, metadata = chunk_and_prepare_metadata([document])
+    ids = [chunk_point_id(meta["page_id"], meta["chunk_index"]) for meta in metadata]
+    existing = indexed_page["chunks"] if indexed_page else {}
+
+    changed = [
+        i
+        for i, (point_id, meta) in enumerate(zip(ids, metadata))
+        if existing.get(point_id) != meta["content_hash"]
+    ]
+    unchanged = sorted(set(range(len(ids))) - set(changed))
+
+    vectors = encode([chunks[i] for i in changed])
+    if changed:
+        client.upsert(
+            collection_name=QDRANT_COLLECTION,
+            points=[
+                models.PointStruct(
+                    id=ids[i],
+                    vector=vector,
+                    payload={"page_content": chunks[i], "metadata": metadata[i]},
+                )
+                for i, vector in zip(changed, vectors)
+            ],
+        )
+    if unchanged:
+        client.batch_update_points(
+            collection_name=QDRANT_COLLECTION,
+            update_operations=[
+                models.SetPayloadOperation(
+                    set_payload=models.SetPayload(
+                        payload={"metadata": metadata[i]}, points=[ids[i]]
+                    )
+                )
+                for i in unchanged
+            ],
+        )
+
+    stale_ids = set(existing) - set(ids)
+    if stale_ids:
+        client.delete(
+            collection_name=QDRANT_COLLECTION,
+            points_selector=models.PointIdsList(points=list(stale_ids)),
+        )
+    return len(changed)
+
+
+def sync_index() -> dict[str, int] | None:
+    if not index_lock.acquire(blocking=False):
+        print("Index sync or rebuild already running, skipping")
+        return None
+    try:
+        client = get_qdrant_client()
+        indexed = load_indexed_pages(client)
+        stats = {"pages_updated": 0, "chunks_embedded": 0, "pages_removed": 0}
+        failed_spaces = set()
+        seen_pages = set()
+        touched_pages = []
+
+        # The space listing is complete or raises; an empty one is refused like an empty crawl
+        spaces = get_all_spaces()
+        if not spaces:
+            raise ConfluenceError("The space listing returned no spaces")
+        for space in spaces:
+            # A space whose pages cannot be listed loses no pages this round
+            try:
+                pages = get_available_titles(space["key"])
+            except ConfluenceError as e:
+                print("Index sync skipped a space:", e)
+                failed_spaces.add(space["key"])
+                continue
+            for page in pages:
+                seen_pages.add(page["id"])
+                indexed_page = indexed.get(page["id"])
+                if (
+                    indexed_page
+                    and page["version"] is not None
+                    and indexed_page["version"] == page["version"]
+                    and indexed_page["space_key"] == space["key"]
+                ):
+                    continue
+                try:
+                    document = get_page_document(space["key"], page)
+                except ConfluenceError as e:
+                    print("Index sync skipped a page:", e)
+                    continue
+                if not document:
+                    continue
+                stats["chunks_embedded"] += sync_page(client, document, indexed_page)
+                stats["pages_updated"] += 1
+                touched_pages.append(page["id"])
+
+        # Pages of deleted or no longer listed spaces go too
+        removed_pages = [
+            page_id
+            for page_id, page in indexed.items()
+            if page_id not in seen_pages and page["space_key"] not in failed_spaces
+        ]
+        if removed_pages:
+            client.delete(
+                collection_name=QDRANT_COLLECTION,
+                points_selector=models.FilterSelector(
+                    filter=models.Filter(
+                        must=[
+                            models.FieldCondition(
+                                key="metadata.page_id",
+                                match=models.MatchAny(any=removed_pages),
+                            )
+                        ]
+                    )
+                ),
+            )
+            for page_id in removed_pages:
+                remove_page(page_id)
+        stats["pages_removed"] = len(removed_pages)
+
+        invalidate_pages(touched_pages + removed_pages)
+        print("Index sync finished:", stats)
+        return stats
+    finally:
+        index_lock.release()
+
+
+async def run_index_sync_periodically(interval_seconds: int) -> None:
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(sync_index)
+        except Exception as e:
+            print("Index sync failed:", e)
+
+
+if __name__ == "__main__":
+    run_exclusive(sync_index)
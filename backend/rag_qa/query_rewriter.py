@@ -0,0 +1,106 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import List
+
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+from llm.registry import get_llm
+
+REWRITE_CACHE_SIZE = 1024
+
+## Words that only make sense with earlier turns, so the query needs rewriting
+REFERENCE_WORDS = {
+    "it",
+    "its",
+    "this",
+    "that",
+    "these",
+    "those",
+    "they",
+    "them",
+    "their",
+    "he",
+    "she",
+    "him",
+    "her",
+    "his",
+    "there",
+    "above",
+    "previous",
+    "same",
+    "former",
+    "latter",
+    "else",
+    "another",
+}
+FOLLOW_UP_PREFIXES = ("and ", "but ", "also ", "what about", "how about", "then ")
+MIN_STANDALONE_WORDS = 4
+
+rephrase_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "Rewrite the user query into a corrected, clear standalone question. "
+            "Fix grammar and spelling mistakes. "
+            "Do NOT add new details. "
+            "Do NOT change meaning. "
+            "Keep it short and focused. ",
+        ),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("user", "{input}"),
+    ]
+)
+
+_lock = threading.Lock()
+_cache: OrderedDict[tuple, str] = OrderedDict()
+_stats = {"no_history": 0, "standalone": 0, "cache_hit": 0, "llm": 0}
+
+
+def is_standalone(query: str) -> bool:
+    normalized = query.lower().strip()
+    words = re.findall(r"[a-z0-9']+", normalized)
+    if len(words) < MIN_STANDALONE_WORDS:
+        return False
+    if normalized.startswith(FOLLOW_UP_PREFIXES):
+        return False
+    return not REFERENCE_WORDS.intersection(words)
+
+
+def _count(path: str) -> None:
+    with _lock:
+        _stats[path] += 1
+
+
+## Resolve a follow-up into a standalone question, calling the LLM only when needed
+async def rewrite_query(query: str, chat_history: List[BaseMessage]) -> str:
+    if not chat_history:
+        _count("no_history")
+        return query
+    if is_standalone(query):
+        _count("standalone")
+        return query
+
+    key = (tuple((m.type, m.content) for m in chat_history), query)
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            _stats["cache_hit"] += 1
+            return _cache[key]
+
+    messages = rephrase_prompt.format_messages(chat_history=chat_history, input=query)
+    response = await get_llm().ainvoke(messages)
+    rewritten = response.content.strip() or query
+
+    with _lock:
+        _stats["llm"] += 1
+        _cache[key] = rewritten
+        if len(_cache) > REWRITE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return rewritten
+
+
+def get_rewrite_stats() -> dict[str, int]:
+    with _lock:
+        return dict(_stats)
@@ -1,32 +1,73 @@
-import os
+import asyncio
+from typing import Any, List
 
-from langchain_core.vectorstores import VectorStoreRetriever
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_qdrant import QdrantVectorStore
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from qdrant_client import models
 
-from rag_qa.confluence_client import get_available_titles, get_public_titles
+from config.settings import QDRANT_COLLECTION
+from rag_qa.embedding_service import (
+    encode_query,
+    get_async_qdrant_client,
+    get_qdrant_client,
+)
 
+PUBLIC_SPACE_KEY = "PUBLIC"
 
-def get_retriever(space_key: str, k: int = 2) -> VectorStoreRetriever:
-    embedding = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
-    )
-    qdrant_url = os.environ.get("QDRANT_URL", "http://localhost:6333")
-    vectordb = QdrantVectorStore.from_existing_collection(
-        embedding=embedding, collection_name="confluence_docs", url=qdrant_url
-    )
 
-    allowed_pages = [p["title"] for p in get_available_titles(space_key)]
-    allowed_pages += [p["title"] for p in get_public_titles()]
-
-    retriever = vectordb.as_retriever(
-        search_kwargs={
-            "k": k,
-            "filter": {
-                "must": [
-                    {"key": "metadata.page_title", "match": {"any": allowed_pages}}
-                ]
-            },
-        }
+def _to_document(point: Any) -> Document:
+    payload = point.payload or {}
+    return Document(
+        page_content=payload.get("page_content", ""),
+        metadata=payload.get("metadata", {}),
     )
-    return retriever
+
+
+## Searches the shared collection for one department plus PUBLIC, sync or async
+class SpaceRetriever(BaseRetriever):
+    space_key: str
+    k: int = 2
+
+    def _filter(self) -> models.Filter:
+        return models.Filter(
+            must=[
+                models.FieldCondition(
+                    key="metadata.space_key",
+                    match=models.MatchAny(any=[self.space_key, PUBLIC_SPACE_KEY]),
+                )
+            ]
+        )
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        response = get_qdrant_client().query_points(
+            collection_name=QDRANT_COLLECTION,
+            query=encode_query(query),
+            query_filter=self._filter(),
+            limit=self.k,
+            with_payload=True,
+        )
+        return [_to_document(point) for point in response.points]
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        # Encoding is CPU-bound, keep it off the event loop
+        vector = await asyncio.to_thread(encode_query, query)
+        response = await get_async_qdrant_client().query_points(
+            collection_name=QDRANT_COLLECTION,
+            query=vector,
+            query_filter=self._filter(),
+            limit=self.k,
+            with_payload=True,
+        )
+        return [_to_document(point) for point in response.points]
+
+
+def get_retriever(space_key: str, k: int = 2) -> SpaceRetriever:
+    return SpaceRetriever(space_key=space_key, k=k)
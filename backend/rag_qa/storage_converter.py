@@ -0,0 +1,213 @@
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+from bs4.element import PreformattedString
+
+from config.settings import CONFLUENCE_DOMAIN
+
+## Bump when the output changes, so stored pages are re-parsed locally
+CONVERTER_VERSION = 1
+
+HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+LISTS = {"ul", "ol"}
+SKIPPED_TAGS = {"script", "style", "ac:parameter"}
+
+
+def _is_text(node) -> bool:
+    # Comments, doctypes and other declarations are PreformattedStrings; CDATA is text
+    return isinstance(node, NavigableString) and (
+        isinstance(node, CData) or not isinstance(node, PreformattedString)
+    )
+
+
+def collect_account_ids(soup: BeautifulSoup) -> list[str]:
+    return [user.get("ri:account-id") for user in soup.find_all("ri:user")]
+
+
+## Single walk over Confluence storage format, emitting Markdown blocks and image urls
+class StorageConverter:
+    def __init__(self, page_id: str, user_names: dict[str, str]):
+        self.page_id = page_id
+        self.user_names = user_names
+        self.blocks: list[str] = []
+        self.images: list[str] = []
+
+    def convert(self, soup: BeautifulSoup) -> dict[str, str | list[str]]:
+        self.add_blocks(soup)
+        return {"text": "\n".join(self.blocks), "images": self.images}
+
+    def add_blocks(self, elem: Tag) -> None:
+        for child in elem.children:
+            if not isinstance(child, Tag):
+                continue
+
+            if child.name in HEADINGS:
+                text = child.get_text(strip=True)
+                if text:
+                    self.blocks.append("\n" + "#" * int(child.name[1]) + f" {text}\n")
+
+            elif child.name == "p":
+                text = self.inline(child)
+                if text:
+                    self.blocks.append(text)
+
+            elif child.name in LISTS:
+                self.add_list(child, depth=0)
+
+            elif child.name == "table":
+                table_text = self.table(child)
+                if table_text:
+                    self.blocks.append(f"{table_text}\n")
+
+            elif child.name == "ac:structured-macro" and child.get("ac:name") == "code":
+                code_text = self.code_block(child)
+                if code_text:
+                    self.blocks.append(code_text)
+
+            elif "emoticon" in child.name:
+                emoji = self.emoticon(child)
+                if emoji:
+                    self.blocks.append(emoji)
+
+            elif child.name in ["ac:image", "img"]:
+                entry = self.image(child)
+                if entry:
+                    self.blocks.append(entry)
+
+            elif child.name in SKIPPED_TAGS:
+                continue
+
+            else:
+                self.add_blocks(child)
+
+    def add_list(self, list_tag: Tag, depth: int) -> None:
+        items = [
+            li for li in list_tag.children if isinstance(li, Tag) and li.name == "li"
+        ]
+        for idx, li in enumerate(items, start=1):
+            nested = [c for c in li.children if isinstance(c, Tag) and c.name in LISTS]
+            text = self.inline(li, skip={id(n) for n in nested})
+            if text:
+                marker = f"{idx}." if list_tag.name == "ol" else "-"
+                self.blocks.append(f"{'  ' * depth}{marker} {text}")
+            for nested_list in nested:
+                self.add_list(nested_list, depth + 1)
+
+    def inline(self, tag: Tag, skip: set[int] | None = None) -> str:
+        parts: list[str] = []
+        self.add_inline(tag, parts, skip or set())
+        return "".join(parts).strip()
+
+    def add_inline(self, elem: Tag, parts: list[str], skip: set[int]) -> None:
+        for node in elem.children:
+            if not isinstance(node, Tag):
+                if _is_text(node):
+                    parts.append(str(node))
+                continue
+
+            if id(node) in skip or node.name in SKIPPED_TAGS:
+                continue
+            elif node.name in ["strong", "b"]:
+                self.add_wrapped(node, parts, "**")
+            elif node.name in ["em", "i"]:
+                self.add_wrapped(node, parts, "*")
+            elif node.name == "code":
+                code = node.get_text(strip=True)
+                if code:
+                    parts.append(f"`{code}`")
+            elif "emoticon" in node.name:
+                parts.append(self.emoticon(node))
+            elif node.name == "a" and node.get("href"):
+                parts.append(f"[{node.get_text(strip=True)}: {node['href']}]")
+            elif node.name == "ac:link" and node.find("ri:user"):
+                account_id = node.find("ri:user").get("ri:account-id")
+                parts.append(f"@{self.user_names.get(account_id, 'Unknown User')}")
+            elif node.name in ["ac:image", "img"]:
+                parts.append(self.image(node) or "")
+            elif node.name == "br":
+                parts.append("\n")
+            else:
+                self.add_inline(node, parts, skip)
+
+    ## Markers hug the text, surrounding whitespace stays outside them
+    def add_wrapped(self, node: Tag, parts: list[str], marker: str) -> None:
+        inner: list[str] = []
+        self.add_inline(node, inner, set())
+        text = "".join(inner)
+        stripped = text.strip()
+        if not stripped:
+            parts.append(text)
+            return
+        leading = text[: len(text) - len(text.lstrip())]
+        trailing = text[len(text.rstrip()) :]
+        parts.append(f"{leading}{marker}{stripped}{marker}{trailing}")
+
+    def emoticon(self, tag: Tag) -> str:
+        emoji_name = tag.get("ac:emoji-shortname", "").strip(":")
+        return f":{emoji_name}:" if emoji_name else ""
+
+    def image(self, tag: Tag) -> str | None:
+        url = None
+        caption = None
+
+        if tag.name == "img":
+            url = tag.get("src")
+            caption = tag.get("alt")
+        else:
+            ri = tag.find("ri:attachment")
+            if ri and ri.get("ri:filename"):
+                url = f"https://{CONFLUENCE_DOMAIN}/wiki/download/attachments/{self.page_id}/{ri['ri:filename']}"
+            cap = tag.find("ac:caption")
+            if cap and cap.get_text(strip=True):
+                caption = cap.get_text(strip=True)
+
+        if not url:
+            return None
+        self.images.append(url)
+        if caption:
+            return f"[Image ({caption}): {url}]"
+        return f"[Image: {url}]"
+
+    def table(self, table_tag: Tag) -> str:
+        rows = []
+        for child in table_tag.children:
+            if not isinstance(child, Tag):
+                continue
+            if child.name == "tr":
+                rows.append(child)
+            elif child.name in ["thead", "tbody", "tfoot"]:
+                rows.extend(
+                    tr
+                    for tr in child.children
+                    if isinstance(tr, Tag) and tr.name == "tr"
+                )
+
+        lines = []
+        for idx, tr in enumerate(rows):
+            cells = [
+                cell.get_text(strip=True)
+                for cell in tr.children
+                if isinstance(cell, Tag) and cell.name in ["th", "td"]
+            ]
+            if idx == 0:
+                lines.append("| " + " | ".join(cells) + " |")
+                lines.append("|" + "|".join(["---"] * len(cells)) + "|")
+            elif cells:
+                lines.append("| " + " | ".join(cells) + " |")
+        return "\n".join(lines)
+
+    def code_block(self, tag: Tag) -> str | None:
+        lang_tag = tag.find("ac:parameter", {"ac:name": "language"})
+        code_tag = tag.find("ac:plain-text-body")
+        if code_tag:
+            code = code_tag.get_text()
+            lang = lang_tag.get_text(strip=True).lower() if lang_tag else ""
+            if lang:
+                return f"```{lang}\n{code}\n```"
+            else:
+                return f"\n```\n{code}\n```"
+        return None
+
+
+def extract_text_and_images(
+    soup: BeautifulSoup, page_id: str, user_names: dict[str, str] | None = None
+) -> dict[str, str | list[str]]:
+    return StorageConverter(page_id, user_names or {}).convert(soup)
@@ -1,30 +1,245 @@
-from langchain_core.documents import Document
-from langchain_huggingface.embeddings import HuggingFaceEndpointEmbeddings
-from langchain_qdrant import QdrantVectorStore
+import json
+import os
+import threading
+import time
 
-from config.settings import HF_API_TOKEN
-from rag_qa.chunker import chunk_and_prepare_metadata
-from rag_qa.confluence_client import get_all_pages
+from qdrant_client import QdrantClient, models
 
+from config.settings import (
+    EMBEDDING_CLI_PROCESSES,
+    EMBEDDING_PROCESSES,
+    INDEX_UPSERT_BATCH_SIZE,
+    LOCAL_DATA_DIR,
+    QDRANT_COLLECTION,
+    QDRANT_URL,
+)
+from rag_qa.answer_cache import clear_answer_cache
+from rag_qa.chunker import chunk_and_prepare_metadata, chunk_point_id
+from rag_qa.confluence_client import ConfluenceError, iter_all_pages
+from rag_qa.embedding_service import build_encoder, embedding_size
+from rag_qa.index_sync import index_lock, run_exclusive
+
+INDEXED_PAYLOAD_FIELDS = ["metadata.space_key", "metadata.page_id"]
+
+## Each build writes a new versioned collection; QDRANT_COLLECTION is an alias to the live one
+VERSION_PREFIX = f"{QDRANT_COLLECTION}_v"
+
+## Build progress is mirrored to a file, so every server worker can report it
+STATUS_PATH = os.path.join(LOCAL_DATA_DIR, "index_build.json")
+STATUS_WRITE_INTERVAL_SECONDS = 1.0
+
+_status_lock = threading.Lock()
+_status = {
+    "state": "idle",
+    "collection": None,
+    "pages_indexed": 0,
+    "chunks_indexed": 0,
+    "started_at": None,
+    "finished_at": None,
+    "error": None,
+}
+_status_written_at = 0.0
+
+
+def _write_status() -> None:
+    global _status_written_at
+    try:
+        os.makedirs(os.path.dirname(STATUS_PATH) or ".", exist_ok=True)
+        tmp_path = f"{STATUS_PATH}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(_status, f)
+        os.replace(tmp_path, STATUS_PATH)
+        _status_written_at = time.time()
+    except OSError as e:
+        print("Failed to write index build status:", e)
+
+
+def get_build_status() -> dict:
+    try:
+        with open(STATUS_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        with _status_lock:
+            return dict(_status)
 
-def build_vector_db(url: str, collection: str) -> None:
-    embedding = HuggingFaceEndpointEmbeddings(
-        model="sentence-transformers/all-MiniLM-L6-v2",
-        task="feature-extraction",
-        huggingfacehub_api_token=HF_API_TOKEN,
-    )
 
-    documents = get_all_pages()
-    chunks, metadata = chunk_and_prepare_metadata(documents)
+def update_build_status(**changes) -> None:
+    with _status_lock:
+        _status.update(changes)
+        _write_status()
 
-    docs = [
-        Document(page_content=chunk, metadata=meta)
-        for chunk, meta in zip(chunks, metadata)
-    ]
 
-    QdrantVectorStore.from_documents(
-        docs,
-        embedding=embedding,
-        url=url,
+def add_build_progress(pages: int, chunks: int) -> None:
+    with _status_lock:
+        _status["pages_indexed"] += pages
+        _status["chunks_indexed"] += chunks
+        if time.time() - _status_written_at >= STATUS_WRITE_INTERVAL_SECONDS:
+            _write_status()
+
+
+## Create keyword indexes for the payload fields retrieval filters on
+def create_payload_indexes(client: QdrantClient, collection: str) -> None:
+    for field in INDEXED_PAYLOAD_FIELDS:
+        client.create_payload_index(
+            collection_name=collection,
+            field_name=field,
+            field_schema=models.PayloadSchemaType.KEYWORD,
+        )
+
+
+def has_payload_indexes(client: QdrantClient, collection: str) -> bool:
+    payload_schema = client.get_collection(collection).payload_schema
+    return all(field in payload_schema for field in INDEXED_PAYLOAD_FIELDS)
+
+
+## Points use the same payload layout as QdrantVectorStore, which the retriever reads
+def upsert_chunks(
+    client: QdrantClient,
+    collection: str,
+    encode_batch,
+    chunks: list[str],
+    metadata: list[dict],
+) -> None:
+    vectors = encode_batch(chunks)
+    client.upsert(
         collection_name=collection,
+        points=[
+            models.PointStruct(
+                id=chunk_point_id(meta["page_id"], meta["chunk_index"]),
+                vector=vector,
+                payload={"page_content": chunk, "metadata": meta},
+            )
+            for chunk, meta, vector in zip(chunks, metadata, vectors)
+        ],
     )
+
+
+def build_vector_db(
+    client: QdrantClient, collection: str, processes: int = EMBEDDING_PROCESSES
+) -> None:
+    client.create_collection(
+        collection_name=collection,
+        vectors_config=models.VectorParams(
+            size=embedding_size(), distance=models.Distance.COSINE
+        ),
+    )
+    create_payload_indexes(client, collection)
+
+    # Pages stream in from the crawler; each fixed-size batch is embedded across
+    # the worker processes and upserted before the next one is collected
+    with build_encoder(processes) as encode_batch:
+        chunks, metadata = [], []
+        pages = 0
+        for document in iter_all_pages():
+            pages += 1
+            page_chunks, page_metadata = chunk_and_prepare_metadata([document])
+            chunks.extend(page_chunks)
+            metadata.extend(page_metadata)
+            add_build_progress(pages=1, chunks=0)
+            while len(chunks) >= INDEX_UPSERT_BATCH_SIZE:
+                upsert_chunks(
+                    client,
+                    collection,
+                    encode_batch,
+                    chunks[:INDEX_UPSERT_BATCH_SIZE],
+                    metadata[:INDEX_UPSERT_BATCH_SIZE],
+                )
+                add_build_progress(pages=0, chunks=INDEX_UPSERT_BATCH_SIZE)
+                chunks = chunks[INDEX_UPSERT_BATCH_SIZE:]
+                metadata = metadata[INDEX_UPSERT_BATCH_SIZE:]
+        if chunks:
+            upsert_chunks(client, collection, encode_batch, chunks, metadata)
+            add_build_progress(pages=0, chunks=len(chunks))
+    # Swapping in an empty index would take every answer offline
+    if not pages:
+        raise ConfluenceError("The crawl returned no pages")
+
+
+## Collection the alias points at; a plain collection under the alias name predates aliases
+def current_collection(client: QdrantClient) -> str | None:
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == QDRANT_COLLECTION:
+            return alias.collection_name
+    if client.collection_exists(QDRANT_COLLECTION):
+        return QDRANT_COLLECTION
+    return None
+
+
+def index_needs_build(client: QdrantClient) -> bool:
+    collection = current_collection(client)
+    # Built before chunks carried space_key/page_id, so filters match nothing
+    return collection is None or not has_payload_indexes(client, collection)
+
+
+## Repoint the alias in one request, so readers never see a missing collection
+def swap_alias(client: QdrantClient, collection: str, previous: str | None) -> None:
+    operations = []
+    if previous and previous != QDRANT_COLLECTION:
+        operations.append(
+            models.DeleteAliasOperation(
+                delete_alias=models.DeleteAlias(alias_name=QDRANT_COLLECTION)
+            )
+        )
+    elif previous:
+        # A plain collection holds the name, it has to go before the alias can exist
+        client.delete_collection(QDRANT_COLLECTION)
+    operations.append(
+        models.CreateAliasOperation(
+            create_alias=models.CreateAlias(
+                collection_name=collection, alias_name=QDRANT_COLLECTION
+            )
+        )
+    )
+    client.update_collection_aliases(change_aliases_operations=operations)
+
+
+## Full rebuild into a fresh collection while the previous one keeps serving. Builds in
+## a server worker encode in-process by default, next to live traffic; the command line
+## spreads encoding over EMBEDDING_CLI_PROCESSES
+def rebuild_index(processes: int = EMBEDDING_PROCESSES) -> str | None:
+    if not index_lock.acquire(blocking=False):
+        print("Index sync or rebuild already running, skipping")
+        return None
+
+    collection = f"{VERSION_PREFIX}{int(time.time())}"
+    update_build_status(
+        state="building",
+        collection=collection,
+        pages_indexed=0,
+        chunks_indexed=0,
+        started_at=time.time(),
+        finished_at=None,
+        error=None,
+    )
+    client = QdrantClient(url=QDRANT_URL)
+    try:
+        previous = current_collection(client)
+        # Leftovers of builds that died before their swap
+        for existing in client.get_collections().collections:
+            if existing.name.startswith(VERSION_PREFIX) and existing.name != previous:
+                client.delete_collection(existing.name)
+
+        build_vector_db(client, collection, processes)
+        swap_alias(client, collection, previous)
+        if previous and previous != QDRANT_COLLECTION:
+            client.delete_collection(previous)
+        clear_answer_cache()
+
+        update_build_status(state="ready", finished_at=time.time())
+        print("Index build finished:", get_build_status())
+        return collection
+    except Exception as e:
+        print("Index build failed:", e)
+        update_build_status(state="failed", finished_at=time.time(), error=str(e))
+        try:
+            client.delete_collection(collection)
+        except Exception as cleanup_error:
+            print("Failed to drop partial index build:", cleanup_error)
+        return None
+    finally:
+        index_lock.release()
+        client.close()
+
+
+if __name__ == "__main__":
+    run_exclusive(lambda: rebuild_index(EMBEDDING_CLI_PROCESSES))
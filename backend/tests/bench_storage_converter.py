@@ -0,0 +1,191 @@
+## Micro-benchmark: single-pass converter vs the previous replace/re-parse parser.
+## Run from backend/: python tests/bench_storage_converter.py [repeat]
+import os
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup, Tag
+
+from config.settings import CONFLUENCE_DOMAIN
+from rag_qa.storage_converter import extract_text_and_images
+
+FIXTURES = Path(__file__).parent / "fixtures" / "storage"
+USER_NAMES = {"557058:alice": "Alice Smith", "557058:bob": "Bob Jones"}
+
+
+## Pre-converter implementation (replace/re-parse per inline tag), kept as the baseline
+def legacy_extract_text_and_images(
+    soup: BeautifulSoup, page_id: str, user_names: dict[str, str]
+) -> dict[str, str | list[str]]:
+    texts = []
+    images = []
+
+    def recurse(elem: Tag) -> None:
+        for child in elem.children:
+            if not isinstance(child, Tag):
+                continue
+
+            if child.name in ["h1", "h2", "h3", "h4", "h5", "h6"]:
+                text = child.get_text(strip=True)
+                if text:
+                    heading = int(child.name[1])
+                    texts.append("\n" + "#" * heading + f" {text}\n")
+
+            elif child.name == "p":
+                text = format_inline(child)
+                if text:
+                    texts.append(text)
+
+            elif child.name == "ol":
+                for idx, li in enumerate(
+                    child.find_all("li", recursive=False), start=1
+                ):
+                    li_text = format_inline(li)
+                    if li_text:
+                        texts.append(f"{idx}. {li_text}")
+
+            elif child.name == "ul":
+                for li in child.find_all("li", recursive=False):
+                    li_text = format_inline(li)
+                    if li_text:
+                        texts.append(f"- {li_text}")
+
+            elif child.name == "table":
+                table_text = extract_table(child)
+                if table_text:
+                    texts.append(f"{table_text}\n")
+
+            elif child.name == "ac:structured-macro" and child.get("ac:name") == "code":
+                code_text = extract_code_block(child)
+                if code_text:
+                    texts.append(code_text)
+
+            elif "emoticon" in (child.name or ""):
+                emoji_name = child.get("ac:emoji-shortname", "").strip(":")
+                if emoji_name:
+                    texts.append(f":{emoji_name}:")
+
+            elif child.name in ["ac:image", "img"]:
+                url = None
+                caption = None
+
+                if child.name == "img":
+                    if child.get("src"):
+                        url = child["src"]
+                    if child.get("alt"):
+                        caption = child["alt"]
+
+                elif child.name == "ac:image":
+                    ri = child.find("ri:attachment")
+                    if ri and ri.get("ri:filename"):
+                        filename = ri["ri:filename"]
+                        url = f"https://{CONFLUENCE_DOMAIN}/wiki/download/attachments/{page_id}/{filename}"
+
+                    cap = child.find("ac:caption")
+                    if cap and cap.get_text(strip=True):
+                        caption = cap.get_text(strip=True)
+
+                if url:
+                    entry = f"[Image: {url}]"
+                    if caption:
+                        entry = f"[Image ({caption}): {url}]"
+                    texts.append(entry)
+                    images.append(url)
+
+            elif child.name in ["script", "style"]:
+                continue
+
+            elif hasattr(child, "children"):
+                recurse(child)
+
+    def format_inline(tag: Tag) -> str:
+        s = tag.decode_contents()
+        for b in tag.find_all(["strong", "b"]):
+            b_text = b.get_text(strip=True)
+            s = s.replace(b_text, f"**{b_text}**")
+        for i in tag.find_all(["em", "i"]):
+            i_text = i.get_text(strip=True)
+            s = s.replace(i_text, f"*{i_text}*")
+        for c in tag.find_all("code"):
+            c_text = c.get_text(strip=True)
+            s = s.replace(c_text, f"`{c_text}`")
+        for emo in tag.find_all(lambda t: "emoticon" in (t.name or "")):
+            short = emo.get("ac:emoji-shortname", "").strip(":")
+            if short:
+                s = s.replace(str(emo), f":{short}:")
+        for link in tag.find_all("a", href=True):
+            link_text = link.get_text(strip=True)
+            link_url = link["href"]
+            s = s.replace(str(link), f"[{link_text}: {link_url}]")
+        for link in tag.find_all("ac:link"):
+            user_tag = link.find("ri:user")
+            if user_tag:
+                account_id = user_tag.get("ri:account-id")
+                user_name = user_names.get(account_id, "Unknown User")
+                s = s.replace(str(link), f"@{user_name}")
+        plain = BeautifulSoup(s, "html.parser").get_text()
+        return plain.strip()
+
+    def extract_table(table_tag: Tag) -> str:
+        rows = []
+        header = table_tag.find("tr")
+        if header:
+            headers = [th.get_text(strip=True) for th in header.find_all(["th", "td"])]
+            rows.append("| " + " | ".join(headers) + " |")
+            rows.append("|" + "|".join(["---"] * len(headers)) + "|")
+        for tr in table_tag.find_all("tr")[1:]:
+            cells = [td.get_text(strip=True) for td in tr.find_all(["td", "th"])]
+            if cells:
+                rows.append("| " + " | ".join(cells) + " |")
+        return "\n".join(rows)
+
+    def extract_code_block(tag: Tag) -> str | None:
+        lang_tag = tag.find("ac:parameter", {"ac:name": "language"})
+        code_tag = tag.find("ac:plain-text-body")
+        if code_tag:
+            code = code_tag.get_text()
+            lang = lang_tag.get_text(strip=True).lower() if lang_tag else ""
+            if lang:
+                return f"```{lang}\n{code}\n```"
+            else:
+                return f"\n```\n{code}\n```"
+        return None
+
+    recurse(soup)
+    return {"text": "\n".join(texts), "images": images}
+
+
+## A large runbook-like page: every fixture repeated, plus long formatted paragraphs
+def build_page(copies: int) -> str:
+    fixtures = "".join(path.read_text() for path in sorted(FIXTURES.glob("*.html")))
+    paragraph = (
+        "<p>"
+        + " ".join(
+            f"Step {i}: run <code>make deploy-{i}</code> as <strong>admin {i}</strong> "
+            f"and read <a href='https://wiki/{i}'>guide {i}</a>."
+            for i in range(40)
+        )
+        + "</p>"
+    )
+    return (fixtures + paragraph) * copies
+
+
+def main(repeat: int = 5) -> None:
+    html = build_page(copies=20)
+    print(f"page size: {len(html) / 1024:.0f} KiB, best of {repeat}")
+    for name, fn in [
+        ("legacy", legacy_extract_text_and_images),
+        ("single-pass", extract_text_and_images),
+    ]:
+        soup = BeautifulSoup(html, "html.parser")
+        seconds = min(
+            timeit.repeat(lambda: fn(soup, "123", USER_NAMES), number=1, repeat=repeat)
+        )
+        print(f"{name:>12}: {seconds * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ["JWT_SECRET_KEY"] = "testsecret"
+os.environ["JWT_ALGORITHM"] = "HS256"
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from qdrant_client import QdrantClient
+
+import rag_qa.answer_cache as answer_cache
+from config.settings import ANSWER_CACHE_COLLECTION, ANSWER_CACHE_TTL_SECONDS
+
+
+class AsyncView:
+    # The in-memory async client keeps its own data, so serve both APIs from one store
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+
+        return call
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    client = QdrantClient(":memory:")
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(answer_cache, "get_qdrant_client", lambda: client)
+    monkeypatch.setattr(
+        answer_cache, "get_async_qdrant_client", lambda: AsyncView(client)
+    )
+    monkeypatch.setattr(answer_cache, "encode_query", lambda text: [1.0, 0.0, 0.0])
+    monkeypatch.setattr(answer_cache, "time", SimpleNamespace(time=lambda: clock.now))
+    answer_cache.ensure_answer_cache_collection()
+    return SimpleNamespace(client=client, clock=clock)
+
+
+def store(answer, vector=(1.0, 0.0, 0.0), space_key="IT", page_ids=("1",)):
+    asyncio.run(
+        answer_cache.store_answer(
+            space_key,
+            "How do I connect to the VPN?",
+            list(vector),
+            answer,
+            ["https://wiki/vpn"],
+            ["VPN"],
+            list(page_ids),
+        )
+    )
+
+
+def lookup(vector=(1.0, 0.0, 0.0), space_key="IT"):
+    return asyncio.run(answer_cache.lookup_answer(space_key, list(vector)))
+
+
+def cached_count(cache):
+    return cache.client.count(ANSWER_CACHE_COLLECTION).count
+
+
+def test_lookup_needs_a_close_question_in_the_same_space(cache):
+    store("Use the VPN client.")
+    assert lookup()["answer"] == "Use the VPN client."
+    assert lookup(vector=(0.99, 0.05, 0.0))["links"] == ["https://wiki/vpn"]
+    # Below the similarity threshold, or asked in another department
+    assert lookup(vector=(0.6, 0.8, 0.0)) is None
+    assert lookup(space_key="HR") is None
+
+
+def test_expired_answers_are_not_served(cache):
+    store("Use the VPN client.")
+    cache.clock.now += ANSWER_CACHE_TTL_SECONDS - 1
+    assert lookup() is not None
+    cache.clock.now += 2
+    assert lookup() is None
+
+
+def test_no_information_answers_are_not_cached(cache):
+    store(f"{answer_cache.NO_INFORMATION_ANSWER}.")
+    store("")
+    assert cached_count(cache) == 0
+
+
+def test_invalidate_pages_drops_answers_built_from_them(cache):
+    store("From page one.", page_ids=["1", "3"])
+    store("From page two.", vector=(0.0, 1.0, 0.0), page_ids=["2"])
+
+    answer_cache.invalidate_pages(["3"])
+    assert cached_count(cache) == 1
+    assert lookup() is None
+    assert lookup(vector=(0.0, 1.0, 0.0))["answer"] == "From page two."
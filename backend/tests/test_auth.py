@@ -0,0 +1,85 @@
+import asyncio
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ["JWT_SECRET_KEY"] = "testsecret"
+os.environ["JWT_ALGORITHM"] = "HS256"
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auth.auth as auth
+from app import app
+from db.db_auth import get_db
+
+client = TestClient(app)
+
+EMPLOYEE = SimpleNamespace(
+    id=7,
+    email="ann@acme.io",
+    full_name="Ann Lee",
+    department="ML",
+    position_obj=SimpleNamespace(position="ENGINEER", position_level="SENIOR"),
+)
+
+
+def test_claims_token_needs_no_database():
+    token = auth.create_access_token(auth.user_claims(EMPLOYEE))
+    user = auth.get_current_user(token)
+    assert (user.id, user.department, user.position) == (7, "ML", "ENGINEER")
+
+    def no_db():
+        raise AssertionError("identity must not open a database session")
+
+    app.dependency_overrides[get_db] = no_db
+    try:
+        response = client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+    finally:
+        app.dependency_overrides.clear()
+    assert response.json() == {
+        "id": 7,
+        "full_name": "Ann Lee",
+        "email": "ann@acme.io",
+        "department": "ML",
+        "position": "ENGINEER",
+        "position_level": "SENIOR",
+    }
+
+
+def test_tokens_without_claims_are_refused():
+    token = auth.create_access_token({"sub": "ann@acme.io"})
+    with pytest.raises(HTTPException) as error:
+        auth.get_current_user(token)
+    assert error.value.status_code == 401
+
+    response = client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+
+def test_password_jobs_run_off_loop_and_refuse_when_saturated(monkeypatch):
+    monkeypatch.setattr(auth, "PASSWORD_HASH_MAX_PENDING", 1)
+    release = threading.Event()
+
+    def slow_hash():
+        release.wait(5)
+        return threading.current_thread().name
+
+    async def scenario():
+        first = asyncio.create_task(auth.run_password_job(slow_hash))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as refused:
+            await auth.run_password_job(slow_hash)
+        release.set()
+        return await first, refused.value
+
+    thread_name, refused = asyncio.run(scenario())
+    assert thread_name.startswith("password-hash")
+    assert refused.status_code == 503
+    assert refused.headers["Retry-After"] == "1"
+    assert auth._hash_pending == 0
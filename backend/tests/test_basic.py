@@ -17,3 +17,8 @@ client = TestClient(app)
 def test_me_unauthorized():
     response = client.get("/auth/me")
     assert response.status_code == 401
+
+
+def test_index_status_unauthorized():
+    response = client.get("/index/status")
+    assert response.status_code == 401
@@ -0,0 +1,306 @@
+import asyncio
+import datetime
+import os
+import sys
+from types import SimpleNamespace
+
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ["JWT_SECRET_KEY"] = "testsecret"
+os.environ["JWT_ALGORITHM"] = "HS256"
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage, HumanMessage
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import agents.qa_agent as qa_agent
+import api.chat_router as chat_router
+from app import app
+from auth.auth import get_current_user
+from db.crud import create_session, load_chat_history, save_messages
+from db.db_auth import AsyncSessionLocal, async_engine, get_async_db, to_async_url
+from db.models import Base, Employee
+
+
+async def create_tables():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+asyncio.run(create_tables())
+
+client = TestClient(app)
+
+
+def setup_function():
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(
+        id=1, department="ML"
+    )
+
+
+def teardown_function():
+    app.dependency_overrides.clear()
+
+
+def test_chat_session_lifecycle():
+    session_id = client.post("/chat/chats").json()["session_id"]
+
+    response = client.put(f"/chat/chats/{session_id}/rename", json={"new_name": "vpn"})
+    assert response.json() == {"id": session_id, "name": "vpn"}
+    assert {"id": session_id, "name": "vpn"} in client.get("/chat/chats").json()
+    assert client.get(f"/chat/chats/{session_id}/messages").json() == []
+
+    assert client.delete(f"/chat/chats/{session_id}").status_code == 200
+    assert client.get(f"/chat/chats/{session_id}/messages").status_code == 403
+
+
+def test_ask_stream_sends_sources_then_tokens_and_saves(monkeypatch):
+    async def fake_stream(user_message, space_key, chat_history):
+        yield {"type": "sources", "links": ["https://wiki/vpn"], "titles": ["VPN"]}
+        for token in ["Use ", "the VPN."]:
+            yield {"type": "token", "content": token}
+
+    async def fake_session_name(first_message):
+        return "Vpn setup"
+
+    monkeypatch.setattr(qa_agent, "stream_qa_chain", fake_stream)
+    monkeypatch.setattr(chat_router, "generate_session_name", fake_session_name)
+
+    session_id = client.post("/chat/chats").json()["session_id"]
+    response = client.post(
+        f"/chat/chats/{session_id}/ask/stream", json={"query": "How to VPN?"}
+    )
+
+    events = [block.split("\n")[0] for block in response.text.strip().split("\n\n")]
+    assert events == [
+        "event: sources",
+        "event: token",
+        "event: token",
+        "event: done",
+    ]
+    messages = client.get(f"/chat/chats/{session_id}/messages").json()
+    assert [m["content"] for m in messages] == ["How to VPN?", "Use the VPN."]
+    assert messages[1]["links"] == ["https://wiki/vpn"]
+
+
+def test_ask_holds_no_transaction_during_the_llm_call(monkeypatch):
+    sessions = []
+    real_load = qa_agent.load_chat_history
+
+    async def tracking_load(db, session_id):
+        sessions.append(db)
+        return await real_load(db, session_id)
+
+    async def fake_qa_chain(user_message, space_key, chat_history):
+        assert not sessions[0].in_transaction()
+        return "Use the VPN.", [], []
+
+    async def fake_session_name(first_message):
+        assert not sessions[0].in_transaction()
+        return "Vpn"
+
+    monkeypatch.setattr(qa_agent, "load_chat_history", tracking_load)
+    monkeypatch.setattr(qa_agent, "run_qa_chain", fake_qa_chain)
+    monkeypatch.setattr(chat_router, "generate_session_name", fake_session_name)
+
+    session_id = client.post("/chat/chats").json()["session_id"]
+    response = client.post(f"/chat/chats/{session_id}/ask", json={"query": "VPN?"})
+    assert response.json()["session_name"] == "Vpn"
+    messages = client.get(f"/chat/chats/{session_id}/messages").json()
+    assert [m["content"] for m in messages] == ["VPN?", "Use the VPN."]
+
+
+def test_stream_holds_no_connection_while_tokens_flow(monkeypatch):
+    steps = []
+    real_load = qa_agent.load_chat_history
+
+    async def tracked_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+        steps.append("request session closed")
+
+    async def tracking_load(db, session_id):
+        steps.append(db)
+        return await real_load(db, session_id)
+
+    async def fake_stream(user_message, space_key, chat_history):
+        assert not steps[-1].in_transaction()
+        steps.append("streaming")
+        yield {"type": "token", "content": "Use the VPN."}
+
+    async def fake_session_name(first_message):
+        return "Vpn"
+
+    app.dependency_overrides[get_async_db] = tracked_db
+    monkeypatch.setattr(qa_agent, "load_chat_history", tracking_load)
+    monkeypatch.setattr(qa_agent, "stream_qa_chain", fake_stream)
+    monkeypatch.setattr(chat_router, "generate_session_name", fake_session_name)
+
+    session_id = client.post("/chat/chats").json()["session_id"]
+    steps.clear()
+    response = client.post(
+        f"/chat/chats/{session_id}/ask/stream", json={"query": "VPN?"}
+    )
+    assert 'event: done\ndata: {"session_name": "Vpn"}' in response.text
+    assert steps[0] == "request session closed" and steps[2] == "streaming"
+    assert client.get("/chat/chats").json()[0] == {"id": session_id, "name": "Vpn"}
+
+
+def test_history_loads_only_the_latest_window(monkeypatch):
+    seen_history = []
+
+    async def fake_stream(user_message, space_key, chat_history):
+        seen_history.append(chat_history)
+        yield {"type": "token", "content": f"answer to {user_message}"}
+
+    async def fake_session_name(first_message):
+        return "History"
+
+    monkeypatch.setattr(qa_agent, "stream_qa_chain", fake_stream)
+    monkeypatch.setattr(chat_router, "generate_session_name", fake_session_name)
+
+    session_id = client.post("/chat/chats").json()["session_id"]
+    for i in range(4):
+        client.post(f"/chat/chats/{session_id}/ask/stream", json={"query": f"q{i}"})
+
+    assert [m.content for m in seen_history[-1]] == [
+        "answer to q1",
+        "q2",
+        "answer to q2",
+    ]
+
+    async def load(limit):
+        async with AsyncSessionLocal() as db:
+            return await load_chat_history(db, session_id, limit=limit)
+
+    history = asyncio.run(load(limit=2))
+    assert [type(m).__name__ for m in history] == ["HumanMessage", "AIMessage"]
+    assert [m.content for m in history] == ["q3", "answer to q3"]
+
+
+def test_chat_list_pages_by_cursor_and_revalidates():
+    created = [client.post("/chat/chats").json()["session_id"] for _ in range(3)]
+
+    first = client.get("/chat/chats", params={"limit": 2})
+    assert [c["id"] for c in first.json()] == created[::-1][:2]
+    second = client.get(
+        "/chat/chats", params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]}
+    )
+    assert second.json()[0]["id"] == created[0]
+
+    etag = first.headers["ETag"]
+    cached = client.get(
+        "/chat/chats", params={"limit": 2}, headers={"If-None-Match": etag}
+    )
+    assert cached.status_code == 304 and cached.content == b""
+
+    client.put(f"/chat/chats/{created[-1]}/rename", json={"new_name": "renamed"})
+    changed = client.get(
+        "/chat/chats", params={"limit": 2}, headers={"If-None-Match": etag}
+    )
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+    assert (
+        client.get("/chat/chats", params={"cursor": "not-a-cursor"}).status_code == 400
+    )
+
+
+def test_messages_page_backwards_from_newest(monkeypatch):
+    async def fake_stream(user_message, space_key, chat_history):
+        yield {"type": "token", "content": f"answer to {user_message}"}
+
+    async def fake_session_name(first_message):
+        return "Pages"
+
+    monkeypatch.setattr(qa_agent, "stream_qa_chain", fake_stream)
+    monkeypatch.setattr(chat_router, "generate_session_name", fake_session_name)
+
+    session_id = client.post("/chat/chats").json()["session_id"]
+    for i in range(3):
+        client.post(f"/chat/chats/{session_id}/ask/stream", json={"query": f"q{i}"})
+
+    url = f"/chat/chats/{session_id}/messages"
+    latest = client.get(url, params={"limit": 4})
+    assert [m["content"] for m in latest.json()] == [
+        "q1",
+        "answer to q1",
+        "q2",
+        "answer to q2",
+    ]
+    older = client.get(
+        url, params={"limit": 4, "cursor": latest.headers["X-Next-Cursor"]}
+    )
+    assert [m["content"] for m in older.json()] == ["q0", "answer to q0"]
+    assert "X-Next-Cursor" not in older.headers
+
+    revalidated = client.get(
+        url, params={"limit": 4}, headers={"If-None-Match": latest.headers["ETag"]}
+    )
+    assert revalidated.status_code == 304
+
+
+def test_chat_timestamps_bind_as_naive_utc(monkeypatch):
+    bound = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        # Values as handed to the driver, before SQLite's own string conversion
+        bound.extend(
+            value
+            for row in context.compiled_parameters
+            for value in row.values()
+            if isinstance(value, datetime.datetime)
+        )
+
+    async def fake_stream(user_message, space_key, chat_history):
+        yield {"type": "token", "content": "Use the VPN."}
+
+    async def fake_session_name(first_message):
+        return "Vpn"
+
+    monkeypatch.setattr(qa_agent, "stream_qa_chain", fake_stream)
+    monkeypatch.setattr(chat_router, "generate_session_name", fake_session_name)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        session_id = client.post("/chat/chats").json()["session_id"]
+        client.post(f"/chat/chats/{session_id}/ask/stream", json={"query": "VPN?"})
+        first = client.get("/chat/chats", params={"limit": 1})
+        client.get(
+            "/chat/chats", params={"limit": 1, "cursor": first.headers["X-Next-Cursor"]}
+        )
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+    # asyncpg encodes TIMESTAMP as `value - datetime(2000, 1, 1)`
+    assert bound
+    assert all(value.tzinfo is None for value in bound)
+
+
+@pytest.mark.skipif(
+    not os.environ.get("TEST_POSTGRES_URL"), reason="needs TEST_POSTGRES_URL"
+)
+def test_chat_writes_through_asyncpg():
+    async def run():
+        engine = create_async_engine(to_async_url(os.environ["TEST_POSTGRES_URL"]))
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            await conn.run_sync(Base.metadata.create_all)
+            db = AsyncSession(bind=conn, join_transaction_mode="create_savepoint")
+            employee = Employee(
+                full_name="Pg", email="pg@acme.io", password="x", department="ML"
+            )
+            db.add(employee)
+            await db.flush()
+            session = await create_session(db, user_id=employee.id, name="pg")
+            await save_messages(
+                db, session, [HumanMessage(content="q"), AIMessage(content="a")]
+            )
+            assert session.last_active.tzinfo is None
+            await db.close()
+            await transaction.rollback()
+        await engine.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,130 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_qa.chunker import chunk_and_prepare_metadata, chunk_text
+
+
+def count_words(texts):
+    count_words.calls += 1
+    return [len(text.split()) for text in texts]
+
+
+count_words.calls = 0
+
+
+def words(n, word="word"):
+    return " ".join([word] * n)
+
+
+def test_small_page_is_one_chunk_with_breadcrumbs():
+    text = "\n# VPN\n\nIntro line.\n\n## macOS\n\nInstall the client.\n"
+    chunks = chunk_text(text, count_words, max_tokens=50, min_tokens=1)
+    assert len(chunks) == 1
+    assert chunks[0]["headings"] == ["VPN"]
+    assert chunks[0]["text"].startswith("# VPN")
+
+
+def test_sections_split_by_heading_level():
+    text = "\n".join(
+        [
+            "# Guide",
+            words(5, "intro"),
+            "## Setup",
+            words(30, "setup"),
+            "### Linux",
+            words(30, "linux"),
+            "## Usage",
+            words(30, "usage"),
+        ]
+    )
+    chunks = chunk_text(
+        text, count_words, max_tokens=70, overlap_tokens=0, min_tokens=10
+    )
+    assert [c["headings"] for c in chunks] == [
+        ["Guide"],
+        ["Guide", "Setup"],
+        ["Guide", "Usage"],
+    ]
+    # The intro is too small on its own, the whole Setup subtree fits in one chunk
+    assert "intro" in chunks[0]["text"] and "setup" not in chunks[0]["text"]
+    assert "linux" in chunks[1]["text"]
+    assert all(c["token_count"] <= 70 for c in chunks)
+
+
+def test_code_blocks_and_tables_stay_whole():
+    code = "```python\n" + "\n".join(words(3, "x") for _ in range(5)) + "\n```"
+    table = "| A | B |\n|---|---|\n| 1 | 2 |\n| 3 | 4 |"
+    text = "\n".join(["## Code", words(20), code, "## Table", table, words(20)])
+    chunks = chunk_text(text, count_words, max_tokens=25, overlap_tokens=0)
+    code_chunks = [c["text"] for c in chunks if "```python" in c["text"]]
+    table_chunks = [c["text"] for c in chunks if "| A | B |" in c["text"]]
+    assert len(code_chunks) == 1 and code in code_chunks[0]
+    assert len(table_chunks) == 1 and table in table_chunks[0]
+
+
+def test_oversized_blocks_are_split_with_structure():
+    sentences = " ".join(f"Sentence {i} {words(6)}." for i in range(6))
+    rows = "\n".join(f"| {i} | {words(4)} |" for i in range(10))
+    table = f"| Id | Text |\n|---|---|\n{rows}"
+    code = "```bash\n" + "\n".join(f"echo {words(4)}" for _ in range(10)) + "\n```"
+    for block in [sentences, table, code]:
+        chunks = chunk_text(block, count_words, max_tokens=20, overlap_tokens=0)
+        assert len(chunks) > 1
+        assert all(c["token_count"] <= 20 for c in chunks)
+    for chunk in chunk_text(table, count_words, max_tokens=20, overlap_tokens=0):
+        assert chunk["text"].startswith("| Id | Text |\n|---|---|\n")
+    for chunk in chunk_text(code, count_words, max_tokens=20, overlap_tokens=0):
+        assert chunk["text"].startswith("```bash\n") and chunk["text"].endswith("```")
+    for chunk in chunk_text(sentences, count_words, max_tokens=20, overlap_tokens=0):
+        assert chunk["text"].startswith("Sentence") and chunk["text"].endswith(".")
+
+
+def test_overlap_repeats_trailing_paragraphs():
+    paragraphs = [f"p{i} {words(9)}" for i in range(6)]
+    chunks = chunk_text(
+        "\n".join(paragraphs), count_words, max_tokens=30, overlap_tokens=10
+    )
+    assert len(chunks) > 1
+    for previous, current in zip(chunks, chunks[1:]):
+        assert previous["text"].split("\n")[-1] == current["text"].split("\n")[0]
+
+
+def test_heading_leads_the_pieces_of_a_split_paragraph():
+    sentences = " ".join(f"Sentence {i} {words(3)}." for i in range(4))
+    chunks = chunk_text(
+        f"## A\n{sentences}", count_words, max_tokens=12, overlap_tokens=0, min_tokens=1
+    )
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk["text"].startswith("## A\nSentence")
+        assert chunk["token_count"] <= 12
+
+
+def test_pieces_of_an_oversized_paragraph_overlap():
+    sentences = " ".join(f"s{i} {words(4)}." for i in range(6))
+    chunks = chunk_text(sentences, count_words, max_tokens=12, overlap_tokens=5)
+    assert len(chunks) > 1
+    for previous, current in zip(chunks, chunks[1:]):
+        # Each piece repeats the last sentence of the one before
+        last_sentence = previous["text"].split(". ")[-1].rstrip(".")
+        assert current["text"].startswith(last_sentence)
+
+
+def test_tokens_counted_in_one_call_and_metadata():
+    count_words.calls = 0
+    document = {
+        "title": "VPN",
+        "link": "https://acme.atlassian.net/wiki/pages/1",
+        "space_key": "IT",
+        "page_id": "1",
+        "version": 3,
+        "text": "\n".join(["# VPN", words(200), "## macOS", words(200)]),
+    }
+    chunks, metadata = chunk_and_prepare_metadata([document], count_words)
+    assert count_words.calls == 1
+    assert len(chunks) == len(metadata) == 2
+    assert metadata[1]["headings"] == ["VPN", "macOS"]
+    assert metadata[1]["token_count"] == 202
+    assert metadata[1]["total_chunks"] == 2
@@ -0,0 +1,167 @@
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import requests
+
+import rag_qa.confluence_client as confluence_client
+from config.settings import CONFLUENCE_MAX_RETRIES
+
+
+def response(status_code=200, data=None, headers=None):
+    return SimpleNamespace(
+        status_code=status_code,
+        headers=headers or {},
+        json=lambda: data,
+        text="",
+    )
+
+
+class StubSession:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append(params)
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    delays = []
+    monkeypatch.setattr(confluence_client, "time", SimpleNamespace(sleep=delays.append))
+
+    def install(replies):
+        session = StubSession(replies)
+        monkeypatch.setattr(confluence_client, "_get_session", lambda: session)
+        return session, delays
+
+    return install
+
+
+def test_pagination_follows_next_links(stub):
+    session, _ = stub(
+        [
+            response(data={"results": [1, 2], "_links": {"next": "/page2"}}),
+            response(data={"results": [3], "_links": {}}),
+        ]
+    )
+    assert confluence_client.get_all_results("https://wiki/api", {"x": 1}) == [1, 2, 3]
+    assert [(call["x"], call["start"]) for call in session.calls] == [(1, 0), (1, 2)]
+
+
+def test_a_failed_page_fails_the_whole_listing(stub):
+    stub(
+        [
+            response(data={"results": [1], "_links": {"next": "/page2"}}),
+            response(status_code=500),
+        ]
+    )
+    assert confluence_client.get_all_results("https://wiki/api") is None
+
+
+def test_rate_limits_back_off_honouring_retry_after(stub):
+    session, delays = stub(
+        [
+            response(429, headers={"Retry-After": "7"}),
+            response(503),
+            response(200),
+        ]
+    )
+    assert confluence_client.confluence_get("https://wiki/api").status_code == 200
+    assert delays == [7.0, 2.0]
+    assert len(session.calls) == 3
+
+
+def test_transport_errors_are_retried(stub):
+    session, delays = stub(
+        [
+            requests.ConnectionError("reset"),
+            requests.Timeout("slow"),
+            response(200),
+        ]
+    )
+    assert confluence_client.confluence_get("https://wiki/api").status_code == 200
+    assert delays == [1.0, 2.0]
+
+
+def test_transport_errors_raise_once_retries_run_out(stub):
+    session, delays = stub(
+        [requests.ConnectionError("down")] * (CONFLUENCE_MAX_RETRIES + 1)
+    )
+    with pytest.raises(requests.ConnectionError):
+        confluence_client.confluence_get("https://wiki/api")
+    assert len(delays) == CONFLUENCE_MAX_RETRIES
+
+
+def test_failed_listings_raise_instead_of_looking_empty(stub):
+    stub([response(status_code=500), response(status_code=500)])
+    with pytest.raises(confluence_client.ConfluenceError):
+        confluence_client.get_available_titles("IT")
+    with pytest.raises(confluence_client.ConfluenceError):
+        confluence_client.get_all_spaces()
+
+
+def test_only_deleted_pages_are_skipped(stub):
+    stub([response(status_code=404), response(status_code=500)])
+    assert confluence_client.get_content_of_page("42") is None
+    with pytest.raises(confluence_client.ConfluenceError):
+        confluence_client.get_content_of_page("42")
+
+
+def users(*names):
+    return response(
+        data={"results": [{"accountId": n, "displayName": n.upper()} for n in names]}
+    )
+
+
+@pytest.fixture
+def directory(tmp_path, monkeypatch):
+    path = tmp_path / "confluence_users.json"
+    monkeypatch.setattr(confluence_client, "USER_DIRECTORY_PATH", str(path))
+    monkeypatch.setattr(confluence_client, "_user_names", None)
+    monkeypatch.setattr(confluence_client, "_unknown_user_ids", set())
+    return path
+
+
+def test_user_lookups_are_batched_and_kept_on_disk(stub, directory, monkeypatch):
+    monkeypatch.setattr(confluence_client, "USER_BULK_LIMIT", 2)
+    session, _ = stub([users("a", "b"), users("c")])
+
+    names, complete = confluence_client.resolve_user_names(["c", "a", None, "b", "a"])
+    assert complete and names == {"a": "A", "b": "B", "c": "C"}
+    assert [call["accountId"] for call in session.calls] == [["a", "b"], ["c"]]
+    assert json.loads(directory.read_text()) == names
+
+    # A new process reads the directory back instead of asking again
+    monkeypatch.setattr(confluence_client, "_user_names", None)
+    assert confluence_client.resolve_user_names(["b"]) == ({"b": "B"}, True)
+    assert len(session.calls) == 2
+
+
+def test_known_and_unknown_ids_are_not_queried_again(stub, directory):
+    session, _ = stub([users("a")])
+
+    assert confluence_client.resolve_user_names(["a", "gone"]) == ({"a": "A"}, True)
+    assert confluence_client.resolve_user_names(["a", "gone"]) == ({"a": "A"}, True)
+    assert len(session.calls) == 1
+
+
+def test_a_failed_batch_is_reported_and_asked_again(stub, directory, monkeypatch):
+    monkeypatch.setattr(confluence_client, "USER_BULK_LIMIT", 1)
+    session, _ = stub([response(status_code=500), users("b"), users("a")])
+
+    assert confluence_client.resolve_user_names(["a", "b"]) == ({"b": "B"}, False)
+    assert confluence_client.resolve_user_names(["a", "b"]) == (
+        {"a": "A", "b": "B"},
+        True,
+    )
+    assert [call["accountId"] for call in session.calls] == [["a"], ["b"], ["a"]]
@@ -0,0 +1,131 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import rag_qa.confluence_client as confluence_client
+import rag_qa.content_store as content_store
+from rag_qa.storage_converter import CONVERTER_VERSION
+
+STORAGE = '<p>Ask <ac:link><ri:user ri:account-id="a" /></ac:link> about VPN.</p>'
+
+
+def response(status_code=200, data=None):
+    return SimpleNamespace(status_code=status_code, json=lambda: data, text="")
+
+
+def page(version, storage=STORAGE):
+    return response(
+        data={"body": {"storage": {"value": storage}}, "version": {"number": version}}
+    )
+
+
+def users(*names):
+    return response(
+        data={"results": [{"accountId": n, "displayName": n.upper()} for n in names]}
+    )
+
+
+@pytest.fixture
+def confluence(tmp_path, monkeypatch):
+    monkeypatch.setattr(content_store, "PAGES_DIR", str(tmp_path / "pages"))
+    monkeypatch.setattr(
+        confluence_client, "USER_DIRECTORY_PATH", str(tmp_path / "users.json")
+    )
+    monkeypatch.setattr(confluence_client, "_user_names", None)
+    monkeypatch.setattr(confluence_client, "_unknown_user_ids", set())
+
+    replies = []
+    urls = []
+
+    def fake_get(url, params=None):
+        urls.append(url.rsplit("/", 1)[-1])
+        return replies.pop(0)
+
+    monkeypatch.setattr(confluence_client, "confluence_get", fake_get)
+    return replies, urls
+
+
+def store(version, text, converter_version=CONVERTER_VERSION):
+    content_store.save_page(
+        "42", version, STORAGE, {"text": text, "images": []}, converter_version
+    )
+
+
+def test_stored_version_is_read_without_a_request(confluence):
+    _, urls = confluence
+    store(3, "cached text")
+
+    content = confluence_client.get_content_of_page("42", 3)
+    assert content == {"text": "cached text", "images": []}
+    assert urls == []
+
+
+def test_a_miss_is_fetched_and_stored(confluence):
+    replies, urls = confluence
+    replies.extend([page(3), users("a")])
+
+    content = confluence_client.get_content_of_page("42", 3)
+    assert content["text"] == "Ask @A about VPN."
+    assert urls == ["42", "bulk"]
+    stored = content_store.load_page("42", 3)
+    assert stored["storage"] == STORAGE
+    assert (stored["text"], stored["converter_version"]) == (
+        "Ask @A about VPN.",
+        CONVERTER_VERSION,
+    )
+
+
+def test_an_older_converter_version_is_reparsed_from_storage(confluence):
+    replies, urls = confluence
+    replies.append(users("a"))
+    store(3, "old rendering", converter_version=CONVERTER_VERSION - 1)
+
+    assert confluence_client.get_content_of_page("42", 3)["text"] == "Ask @A about VPN."
+    assert urls == ["bulk"]
+    stored = content_store.load_page("42", 3)
+    assert stored["converter_version"] == CONVERTER_VERSION
+
+
+def test_a_failed_user_lookup_is_not_stored(confluence):
+    replies, urls = confluence
+    replies.extend([page(3), response(status_code=500)])
+
+    content = confluence_client.get_content_of_page("42", 3)
+    assert content["text"] == "Ask @Unknown User about VPN."
+    assert content_store.load_page("42", 3) is None
+
+    # The next crawl fetches the page again and stores it once the name resolves
+    replies.extend([page(3), users("a")])
+    assert confluence_client.get_content_of_page("42", 3)["text"] == "Ask @A about VPN."
+    assert content_store.load_page("42", 3)["text"] == "Ask @A about VPN."
+    assert urls == ["42", "bulk", "42", "bulk"]
+
+
+def test_saving_a_version_drops_the_older_ones(confluence):
+    store(1, "first")
+    store(2, "second")
+
+    page_dir = os.path.join(content_store.PAGES_DIR, "42")
+    assert os.listdir(page_dir) == ["2.json"]
+    assert content_store.load_page("42", 1) is None
+
+    content_store.remove_page("42")
+    assert not os.path.exists(page_dir)
+
+
+def test_an_interrupted_write_keeps_the_previous_file(confluence, monkeypatch):
+    store(1, "first")
+
+    def failing_dump(data, f):
+        f.write('{"page_id": ')
+        raise OSError("disk full")
+
+    monkeypatch.setattr(content_store.json, "dump", failing_dump)
+    with pytest.raises(OSError):
+        store(1, "second")
+
+    assert content_store.load_page("42", 1)["text"] == "first"
@@ -0,0 +1,60 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_qa.embedding_store import EmbeddingStore, embed_with_store, text_key
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.encoded = []
+
+    def __call__(self, texts):
+        self.encoded.extend(texts)
+        return [[float(len(text)), 1.0, 0.0] for text in texts]
+
+
+def test_encodes_each_distinct_text_once(tmp_path):
+    store = EmbeddingStore("org/model", 3, root=str(tmp_path))
+    encoder = CountingEncoder()
+
+    vectors = embed_with_store(store, ["boilerplate", "intro", "boilerplate"], encoder)
+    assert encoder.encoded == ["boilerplate", "intro"]
+    assert vectors[0] == vectors[2] == [11.0, 1.0, 0.0]
+
+    # Whitespace differences map to the same entry
+    assert embed_with_store(store, ["intro", "boiler\nplate ", " boilerplate"], encoder)
+    assert encoder.encoded == ["boilerplate", "intro", "boiler\nplate "]
+
+
+def test_vectors_persist_across_processes(tmp_path):
+    first = EmbeddingStore("org/model", 3, root=str(tmp_path))
+    embed_with_store(first, ["a", "bb"], CountingEncoder())
+
+    # A second instance sees existing rows and picks up rows appended later
+    second = EmbeddingStore("org/model", 3, root=str(tmp_path))
+    assert second.get_many([text_key("bb")]) == [[2.0, 1.0, 0.0]]
+    embed_with_store(first, ["ccc"], CountingEncoder())
+    assert second.get_many([text_key("ccc")]) == [[3.0, 1.0, 0.0]]
+
+    encoder = CountingEncoder()
+    embed_with_store(second, ["a", "bb", "ccc"], encoder)
+    assert encoder.encoded == []
+
+
+def test_interrupted_append_is_realigned(tmp_path):
+    store = EmbeddingStore("org/model", 3, root=str(tmp_path))
+    embed_with_store(store, ["a"], CountingEncoder())
+    # A writer died after its vectors landed but before its keys did
+    with open(store.vectors_path, "ab") as f:
+        f.write(b"\x00" * 7)
+    with open(store.keys_path, "ab") as f:
+        f.write(b"\x01" * 5)
+
+    reopened = EmbeddingStore("org/model", 3, root=str(tmp_path))
+    embed_with_store(reopened, ["bb"], CountingEncoder())
+    assert reopened.get_many([text_key("a"), text_key("bb")]) == [
+        [1.0, 1.0, 0.0],
+        [2.0, 1.0, 0.0],
+    ]
@@ -0,0 +1,119 @@
+import contextlib
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qdrant_client import QdrantClient, models
+
+import rag_qa.vector_db_builder as builder
+from config.settings import QDRANT_COLLECTION
+from rag_qa.chunker import chunk_and_prepare_metadata
+
+
+class SharedClient(QdrantClient):
+    # The builder closes its client when done; keep the in-memory data around
+    def close(self, **kwargs):
+        pass
+
+
+def count_words(texts):
+    return [len(text.split()) for text in texts]
+
+
+@contextlib.contextmanager
+def fake_encoder(processes):
+    fake_encoder.processes.append(processes)
+    yield lambda texts: [[1.0, float(len(text)), 0.5] for text in texts]
+
+
+fake_encoder.processes = []
+
+
+def make_pages(prefix):
+    return [
+        {
+            "title": f"{prefix} {i}",
+            "link": f"https://acme.atlassian.net/wiki/{i}",
+            "space_key": "IT",
+            "page_id": str(i),
+            "version": 1,
+            "text": f"# {prefix} {i}\n" + " ".join(["word"] * 60),
+        }
+        for i in range(3)
+    ]
+
+
+def setup_builder(monkeypatch, tmp_path, pages):
+    client = SharedClient(":memory:")
+    monkeypatch.setattr(builder, "STATUS_PATH", str(tmp_path / "index_build.json"))
+    monkeypatch.setattr(builder, "QdrantClient", lambda url: client)
+    monkeypatch.setattr(builder, "build_encoder", fake_encoder)
+    monkeypatch.setattr(builder, "embedding_size", lambda: 3)
+    monkeypatch.setattr(builder, "clear_answer_cache", lambda: None)
+    monkeypatch.setattr(builder, "iter_all_pages", lambda: iter(pages))
+    monkeypatch.setattr(
+        builder,
+        "chunk_and_prepare_metadata",
+        lambda docs: chunk_and_prepare_metadata(docs, count_words),
+    )
+    return client
+
+
+def test_rebuild_swaps_alias_and_drops_previous(monkeypatch, tmp_path):
+    client = setup_builder(monkeypatch, tmp_path, make_pages("First"))
+    assert builder.index_needs_build(client)
+
+    fake_encoder.processes.clear()
+    first = builder.rebuild_index()
+    assert builder.current_collection(client) == first
+    assert client.count(QDRANT_COLLECTION).count == 3
+    # A build inside a server worker encodes in-process next to live traffic
+    assert fake_encoder.processes == [1]
+    status = builder.get_build_status()
+    assert status["state"] == "ready"
+    assert status["pages_indexed"] == 3 and status["chunks_indexed"] == 3
+
+    monkeypatch.setattr(builder, "iter_all_pages", lambda: iter(make_pages("Second")))
+    monkeypatch.setattr(builder.time, "time", lambda: 4102444800)
+    second = builder.rebuild_index()
+    assert second != first
+    assert builder.current_collection(client) == second
+    assert not client.collection_exists(first)
+    point = client.scroll(QDRANT_COLLECTION, limit=1)[0][0]
+    assert point.payload["page_content"].startswith("# Second")
+
+
+def test_failed_build_keeps_serving_previous(monkeypatch, tmp_path):
+    client = setup_builder(monkeypatch, tmp_path, make_pages("First"))
+    # A collection from before aliases is replaced by the first versioned build
+    client.create_collection(
+        QDRANT_COLLECTION,
+        vectors_config=models.VectorParams(size=3, distance=models.Distance.COSINE),
+    )
+    first = builder.rebuild_index()
+    assert builder.current_collection(client) == first
+
+    def broken_pages():
+        yield from make_pages("Broken")
+        raise RuntimeError("Confluence went away")
+
+    monkeypatch.setattr(builder, "iter_all_pages", broken_pages)
+    monkeypatch.setattr(builder.time, "time", lambda: 4102444800)
+    assert builder.rebuild_index() is None
+    assert builder.get_build_status()["state"] == "failed"
+    assert builder.current_collection(client) == first
+    assert not client.collection_exists(f"{builder.VERSION_PREFIX}4102444800")
+    assert client.count(QDRANT_COLLECTION).count == 3
+
+
+def test_empty_crawl_keeps_serving_previous(monkeypatch, tmp_path):
+    client = setup_builder(monkeypatch, tmp_path, make_pages("First"))
+    first = builder.rebuild_index()
+
+    monkeypatch.setattr(builder, "iter_all_pages", lambda: iter([]))
+    monkeypatch.setattr(builder.time, "time", lambda: 4102444800)
+    assert builder.rebuild_index() is None
+    assert "no pages" in builder.get_build_status()["error"]
+    assert builder.current_collection(client) == first
+    assert client.count(QDRANT_COLLECTION).count == 3
@@ -0,0 +1,204 @@
+import fcntl
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from qdrant_client import QdrantClient, models
+
+import rag_qa.index_sync as index_sync
+from config.settings import QDRANT_COLLECTION
+from rag_qa.chunker import chunk_and_prepare_metadata
+from rag_qa.confluence_client import ConfluenceError
+
+
+def count_words(texts):
+    return [len(text.split()) for text in texts]
+
+
+def words(n, word):
+    return " ".join([word] * n)
+
+
+TWO_SECTIONS = f"# Setup\n{words(200, 'alpha')}\n# Usage\n{words(200, 'beta')}"
+
+
+class FakeConfluence:
+    def __init__(self):
+        self.spaces = {"IT": {}}
+        self.fetched = []
+
+    def list_pages(self, space_key):
+        if self.spaces[space_key] is None:
+            raise ConfluenceError(f"Could not list the pages of space {space_key}")
+        return [
+            {"id": page_id, "title": f"Page {page_id}", "version": version}
+            for page_id, (version, _) in self.spaces[space_key].items()
+        ]
+
+    def get_document(self, space_key, page):
+        self.fetched.append(page["id"])
+        if self.spaces[space_key][page["id"]][1] is None:
+            raise ConfluenceError(f"Could not fetch page {page['id']}")
+        return {
+            "title": page["title"],
+            "link": f"https://acme.atlassian.net/wiki/{page['id']}",
+            "text": self.spaces[space_key][page["id"]][1],
+            "space_key": space_key,
+            "page_id": page["id"],
+            "version": page["version"],
+        }
+
+
+@pytest.fixture
+def sync(monkeypatch):
+    client = QdrantClient(":memory:")
+    client.create_collection(
+        QDRANT_COLLECTION,
+        vectors_config=models.VectorParams(size=3, distance=models.Distance.COSINE),
+    )
+    confluence = FakeConfluence()
+    encoded, removed, invalidated = [], [], []
+
+    def encode(texts):
+        encoded.extend(texts)
+        return [[1.0, float(len(text)), 0.5] for text in texts]
+
+    monkeypatch.setattr(index_sync, "get_qdrant_client", lambda: client)
+    monkeypatch.setattr(
+        index_sync,
+        "get_all_spaces",
+        lambda: [{"key": key, "name": key} for key in confluence.spaces],
+    )
+    monkeypatch.setattr(index_sync, "get_available_titles", confluence.list_pages)
+    monkeypatch.setattr(index_sync, "get_page_document", confluence.get_document)
+    monkeypatch.setattr(index_sync, "encode", encode)
+    monkeypatch.setattr(index_sync, "remove_page", removed.append)
+    monkeypatch.setattr(index_sync, "invalidate_pages", invalidated.extend)
+    monkeypatch.setattr(
+        index_sync,
+        "chunk_and_prepare_metadata",
+        lambda docs: chunk_and_prepare_metadata(docs, count_words),
+    )
+
+    confluence.spaces["IT"] = {"1": (1, TWO_SECTIONS), "2": (1, words(50, "gamma"))}
+    assert index_sync.sync_index()["pages_updated"] == 2
+    confluence.fetched.clear()
+    encoded.clear()
+    invalidated.clear()
+    return client, confluence, encoded, removed, invalidated
+
+
+def page_points(client, page_id):
+    points, _ = client.scroll(
+        QDRANT_COLLECTION,
+        scroll_filter=models.Filter(
+            must=[
+                models.FieldCondition(
+                    key="metadata.page_id", match=models.MatchValue(value=page_id)
+                )
+            ]
+        ),
+        with_payload=True,
+    )
+    return sorted(points, key=lambda point: point.payload["metadata"]["chunk_index"])
+
+
+def test_pages_with_unchanged_versions_are_skipped(sync):
+    client, confluence, encoded, removed, invalidated = sync
+    stats = index_sync.sync_index()
+    assert stats == {"pages_updated": 0, "chunks_embedded": 0, "pages_removed": 0}
+    assert confluence.fetched == [] and encoded == []
+
+
+def test_only_chunks_whose_text_changed_are_embedded(sync):
+    client, confluence, encoded, removed, invalidated = sync
+    assert len(page_points(client, "1")) == 2
+    changed = TWO_SECTIONS.replace("beta", "delta")
+    confluence.spaces["IT"]["1"] = (2, changed)
+
+    stats = index_sync.sync_index()
+    assert (stats["pages_updated"], stats["chunks_embedded"]) == (1, 1)
+    assert len(encoded) == 1 and "delta" in encoded[0]
+    # The untouched chunk keeps its vector but carries the new version
+    points = page_points(client, "1")
+    assert [p.payload["metadata"]["page_version"] for p in points] == [2, 2]
+    assert invalidated == ["1"]
+
+
+def test_leftover_chunks_of_a_shorter_page_are_deleted(sync):
+    client, confluence, encoded, removed, invalidated = sync
+    confluence.spaces["IT"]["1"] = (2, f"# Setup\n{words(200, 'alpha')}")
+
+    assert index_sync.sync_index()["chunks_embedded"] == 0
+    assert len(page_points(client, "1")) == 1
+
+
+def test_pages_no_longer_listed_are_removed(sync):
+    client, confluence, encoded, removed, invalidated = sync
+    del confluence.spaces["IT"]["2"]
+
+    assert index_sync.sync_index()["pages_removed"] == 1
+    assert page_points(client, "2") == []
+    assert removed == ["2"] and invalidated == ["2"]
+    assert len(page_points(client, "1")) == 2
+
+
+def test_a_failed_space_listing_is_not_a_deletion(sync):
+    client, confluence, encoded, removed, invalidated = sync
+    confluence.spaces["IT"] = None
+
+    assert index_sync.sync_index()["pages_removed"] == 0
+    assert len(page_points(client, "1")) == 2 and len(page_points(client, "2")) == 1
+    assert removed == []
+
+
+@pytest.mark.parametrize("change", ["emptied", "deleted"])
+def test_pages_of_an_emptied_or_deleted_space_are_removed(sync, change):
+    client, confluence, encoded, removed, invalidated = sync
+    confluence.spaces["HR"] = {"3": (1, words(50, "omega"))}
+    if change == "emptied":
+        confluence.spaces["IT"] = {}
+    else:
+        del confluence.spaces["IT"]
+
+    stats = index_sync.sync_index()
+    assert (stats["pages_updated"], stats["pages_removed"]) == (1, 2)
+    assert page_points(client, "1") == [] and page_points(client, "2") == []
+    assert sorted(removed) == ["1", "2"]
+
+
+def test_an_empty_space_listing_stops_the_sync(sync):
+    client, confluence, encoded, removed, invalidated = sync
+    confluence.spaces.clear()
+
+    with pytest.raises(ConfluenceError):
+        index_sync.sync_index()
+    assert len(page_points(client, "1")) == 2 and removed == []
+
+
+def test_a_failed_page_fetch_skips_only_that_page(sync):
+    client, confluence, encoded, removed, invalidated = sync
+    confluence.spaces["IT"]["1"] = (2, None)
+    confluence.spaces["IT"]["3"] = (1, words(50, "omega"))
+
+    stats = index_sync.sync_index()
+    assert (stats["pages_updated"], stats["pages_removed"]) == (1, 0)
+    assert len(page_points(client, "1")) == 2 and len(page_points(client, "3")) == 1
+
+
+def test_command_line_runs_refuse_while_a_server_holds_the_lock(monkeypatch, tmp_path):
+    monkeypatch.setattr(index_sync, "LOCAL_DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(index_sync, "_jobs_lock_file", None)
+    runs = []
+
+    with open(tmp_path / "index_jobs.lock", "w") as server_lock:
+        fcntl.flock(server_lock, fcntl.LOCK_EX)
+        with pytest.raises(SystemExit):
+            index_sync.run_exclusive(lambda: runs.append("sync"))
+    assert runs == []
+
+    index_sync.run_exclusive(lambda: runs.append("sync"))
+    assert runs == ["sync"]
+    index_sync._jobs_lock_file.close()
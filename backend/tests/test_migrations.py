@@ -0,0 +1,154 @@
+import asyncio
+import datetime
+import os
+import sqlite3
+import sys
+
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ["JWT_SECRET_KEY"] = "testsecret"
+os.environ["JWT_ALGORITHM"] = "HS256"
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from db import crud
+from db.models import Base, ChatHistory
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "app.db"
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    config.set_main_option("sqlalchemy.url", f"sqlite:///{path}")
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+    return path
+
+
+def test_migrations_match_models(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    with engine.connect() as conn:
+        assert compare_metadata(MigrationContext.configure(conn), Base.metadata) == []
+
+
+def capture_statements(engine, statements):
+    @event.listens_for(engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "DELETE", "UPDATE")):
+            statements.append((statement, parameters))
+
+
+def test_crud_queries_use_indexes(db_path):
+    statements = []
+    sync_engine = create_engine(f"sqlite:///{db_path}")
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+
+    with sessionmaker(bind=sync_engine)() as db:
+        employee = crud.create_employee(db, "Ann", "ann@acme.io", "x", None, "ML")
+        user_id = employee.id
+
+    async def exercise_chat_queries():
+        async with async_sessionmaker(async_engine, expire_on_commit=False)() as db:
+            sessions = [await crud.create_session(db, user_id, None) for _ in range(3)]
+            for session in sessions:
+                db.add_all(
+                    ChatHistory(session_id=session.id, role="user", content=f"m{i}")
+                    for i in range(5)
+                )
+            await db.commit()
+
+            capture_statements(async_engine.sync_engine, statements)
+            page = await crud.get_sessions_for_user(db, user_id, limit=2)
+            await crud.get_sessions_for_user(
+                db, user_id, limit=2, after=(page[-1].last_active, page[-1].id)
+            )
+            await crud.ensure_session_ownership(db, sessions[0].id, user_id)
+            await crud.get_messages_for_session(db, sessions[0].id, limit=2)
+            await crud.get_messages_for_session(
+                db, sessions[0].id, limit=2, before_id=3
+            )
+            await crud.load_chat_history(db, sessions[0].id)
+            await crud.delete_session(db, sessions[1].id)
+            await crud.delete_expired_refresh_tokens(db, batch_size=100)
+        await async_engine.dispose()
+
+    asyncio.run(exercise_chat_queries())
+
+    capture_statements(sync_engine, statements)
+    with sessionmaker(bind=sync_engine)() as db:
+        crud.get_employee_by_email(db, "ann@acme.io")
+        crud.get_or_create_position(db, "ENGINEER", "SENIOR")
+        expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(1)
+        crud.create_refresh_token(db, user_id, "hashed", expires)
+        crud.rotate_refresh_token(db, "hashed", "rotated", expires)
+
+    conn = sqlite3.connect(db_path)
+    for statement, parameters in statements:
+        plan = [
+            row[3]
+            for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        ]
+        assert plan, statement
+        for step in plan:
+            # A full table or index scan, or a sort no index provides, is a regression
+            assert not step.startswith("SCAN "), (statement, plan)
+            assert "TEMP B-TREE" not in step, (statement, plan)
+    conn.close()
+    assert len(statements) >= 10
+
+
+def test_refresh_tokens_rotate_once_and_expire(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    now = datetime.datetime.now(datetime.timezone.utc)
+    later = now + datetime.timedelta(days=1)
+    with sessionmaker(bind=engine)() as db:
+        ann = crud.create_employee(db, "Ann", "ann@acme.io", "x", None, "ML").id
+        bob = crud.create_employee(db, "Bob", "bob@acme.io", "x", None, "ML").id
+
+        # Signing in again replaces the user's token instead of adding one
+        crud.create_refresh_token(db, ann, "first", later)
+        crud.create_refresh_token(db, ann, "second", later)
+        assert crud.rotate_refresh_token(db, "first", "x", later) is None
+        assert crud.rotate_refresh_token(db, "second", "third", later) == ann
+        # A token that was already rotated cannot be replayed
+        assert crud.rotate_refresh_token(db, "second", "fourth", later) is None
+
+        crud.create_refresh_token(db, bob, "stale", now - datetime.timedelta(1))
+        assert crud.rotate_refresh_token(db, "stale", "fresh", later) is None
+
+    async def sweep():
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        async with async_sessionmaker(async_engine)() as db:
+            deleted = await crud.delete_expired_refresh_tokens(db, batch_size=1)
+        await async_engine.dispose()
+        return deleted
+
+    assert asyncio.run(sweep()) == 1
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT token FROM refresh_tokens").fetchall() == [("third",)]
+    conn.close()
+
+
+def test_sessions_have_a_listing_index(db_path):
+    conn = sqlite3.connect(db_path)
+    indexes = {
+        row[1]: [col[2] for col in conn.execute(f"PRAGMA index_info('{row[1]}')")]
+        for row in conn.execute("PRAGMA index_list('chat_sessions')")
+    }
+    conn.close()
+    assert indexes["ix_chat_sessions_user_id_last_active"] == [
+        "user_id",
+        "last_active",
+        "id",
+    ]
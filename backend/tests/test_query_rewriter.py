@@ -0,0 +1,72 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ["JWT_SECRET_KEY"] = "testsecret"
+os.environ["JWT_ALGORITHM"] = "HS256"
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage, HumanMessage
+
+import rag_qa.query_rewriter as query_rewriter
+from app import app
+from auth.auth import get_current_user
+from rag_qa.query_rewriter import get_rewrite_stats, is_standalone, rewrite_query
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        return AIMessage(content="How do I configure the VPN on macOS?")
+
+
+def test_is_standalone():
+    assert is_standalone("How do I request access to the HR drive?")
+    assert not is_standalone("and on macOS?")
+    assert not is_standalone("How do I configure it on macOS?")
+    assert not is_standalone("What about the staging cluster?")
+
+
+def test_rewrite_query_skips_llm_and_caches(monkeypatch):
+    llm = FakeLLM()
+    monkeypatch.setattr(query_rewriter, "get_llm", lambda: llm)
+    history = [
+        HumanMessage(content="How do I configure the VPN?"),
+        AIMessage(content="Install the client and sign in."),
+    ]
+    before = get_rewrite_stats()
+
+    assert asyncio.run(rewrite_query("hi there", [])) == "hi there"
+    standalone = "How do I request access to the HR drive?"
+    assert asyncio.run(rewrite_query(standalone, history)) == standalone
+    for _ in range(2):
+        rewritten = asyncio.run(rewrite_query("and on macOS?", history))
+        assert rewritten == "How do I configure the VPN on macOS?"
+
+    after = get_rewrite_stats()
+    assert llm.calls == 1
+    assert {path: after[path] - before[path] for path in after} == {
+        "no_history": 1,
+        "standalone": 1,
+        "cache_hit": 1,
+        "llm": 1,
+    }
+
+
+def test_rewrite_stats_are_exposed_to_signed_in_users():
+    client = TestClient(app)
+    assert client.get("/index/rewrite-stats").status_code == 401
+
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=1)
+    try:
+        response = client.get("/index/rewrite-stats")
+    finally:
+        app.dependency_overrides.clear()
+    assert response.json() == get_rewrite_stats()
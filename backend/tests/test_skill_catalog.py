@@ -0,0 +1,120 @@
+import asyncio
+import datetime
+import os
+import sys
+from types import SimpleNamespace
+
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ["JWT_SECRET_KEY"] = "testsecret"
+os.environ["JWT_ALGORITHM"] = "HS256"
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import expert_finder.skill_catalog as skill_catalog
+from db.crud import get_position_by_name_level
+from db.models import Base, utc_now
+
+
+class FakeLLM:
+    def __init__(self, fail=()):
+        self.batches = []
+        self.fail = fail
+
+    async def abatch(self, inputs, config=None, return_exceptions=False):
+        prompts = [messages[0]["content"] for messages in inputs]
+        self.batches.append(prompts)
+        return [
+            (
+                RuntimeError("rate limited")
+                if any(name in prompt for name in self.fail)
+                else SimpleNamespace(content='{"skills": ["Python", "SQL"]}')
+            )
+            for prompt in prompts
+        ]
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    async_engine = create_async_engine(url.replace("sqlite", "sqlite+aiosqlite"))
+    monkeypatch.setattr(
+        skill_catalog, "AsyncSessionLocal", async_sessionmaker(async_engine)
+    )
+    monkeypatch.setattr(skill_catalog, "SKILL_CATALOG_BATCH_SIZE", 2)
+    skill_catalog._position_ids.clear()
+    yield sessionmaker(bind=engine)()
+    asyncio.run(async_engine.dispose())
+
+
+def test_new_pairs_are_recorded_without_calling_the_llm(catalog, monkeypatch):
+    monkeypatch.setattr(skill_catalog, "get_llm", lambda: pytest.fail("LLM called"))
+
+    engineer = skill_catalog.get_catalog_position_id(catalog, "ENGINEER", "SENIOR")
+    assert skill_catalog._position_ids == {("ENGINEER", "SENIOR"): engineer}
+    # Same position at another level is its own entry
+    junior = skill_catalog.get_catalog_position_id(catalog, "ENGINEER", "JUNIOR")
+    assert junior != engineer
+
+    row = get_position_by_name_level(catalog, "ENGINEER", "JUNIOR")
+    assert (row.id, row.skills, row.skills_pending) == (junior, [], True)
+
+
+def test_worker_fills_pending_pairs_in_batches(catalog, monkeypatch):
+    llm = FakeLLM(fail=["'QA'"])
+    monkeypatch.setattr(skill_catalog, "get_llm", lambda: llm)
+    for position in ["ENGINEER", "ANALYST", "DESIGNER", "QA"]:
+        skill_catalog.get_catalog_position_id(catalog, position, "MIDDLE")
+
+    async def fill_until_idle():
+        while await skill_catalog.fill_pending_skills() == 2:
+            pass
+
+    asyncio.run(fill_until_idle())
+    assert [len(batch) for batch in llm.batches] == [2, 2]
+
+    catalog.expire_all()
+    designer = get_position_by_name_level(catalog, "DESIGNER", "MIDDLE")
+    assert (designer.skills, designer.skills_pending) == (["python", "sql"], False)
+    # A failed call leaves the pair pending for the next round
+    assert get_position_by_name_level(catalog, "QA", "MIDDLE").skills_pending
+
+
+def test_failing_pairs_back_off_and_are_given_up(catalog, monkeypatch, capsys):
+    llm = FakeLLM(fail=["'QA'"])
+    monkeypatch.setattr(skill_catalog, "get_llm", lambda: llm)
+    monkeypatch.setattr(skill_catalog, "SKILL_CATALOG_MAX_ATTEMPTS", 2)
+
+    def position(name):
+        catalog.expire_all()
+        return get_position_by_name_level(catalog, name, "MIDDLE")
+
+    skill_catalog.get_catalog_position_id(catalog, "QA", "MIDDLE")
+    assert asyncio.run(skill_catalog.fill_pending_skills()) == 0
+    qa = position("QA")
+    assert (qa.skills_attempts, qa.skills_pending) == (1, True)
+    assert qa.skills_retry_at > utc_now()
+
+    # Not due yet, so a newer pair gets the batch to itself
+    skill_catalog.get_catalog_position_id(catalog, "ENGINEER", "MIDDLE")
+    assert asyncio.run(skill_catalog.fill_pending_skills()) == 1
+    assert len(llm.batches[-1]) == 1 and "'ENGINEER'" in llm.batches[-1][0]
+
+    # Once due it is retried, after pairs that have not failed yet
+    qa.skills_retry_at = utc_now() - datetime.timedelta(seconds=1)
+    catalog.commit()
+    skill_catalog.get_catalog_position_id(catalog, "ANALYST", "MIDDLE")
+    asyncio.run(skill_catalog.fill_pending_skills())
+    assert ["'ANALYST'" in p for p in llm.batches[-1]] == [True, False]
+
+    qa = position("QA")
+    assert (qa.skills_attempts, qa.skills_pending, qa.skills) == (2, False, [])
+    assert "gave up on QA MIDDLE after 2 attempts" in capsys.readouterr().out
+    assert asyncio.run(skill_catalog.fill_pending_skills()) == 0
+    assert len(llm.batches) == 3
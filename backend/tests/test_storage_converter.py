@@ -0,0 +1,35 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+import rag_qa.storage_converter as storage_converter
+from rag_qa.storage_converter import collect_account_ids, extract_text_and_images
+
+FIXTURES = Path(__file__).parent / "fixtures" / "storage"
+USER_NAMES = {"557058:alice": "Alice Smith", "557058:bob": "Bob Jones"}
+
+
+@pytest.mark.parametrize(
+    "fixture", sorted(path.stem for path in FIXTURES.glob("*.html"))
+)
+def test_storage_format_matches_golden_markdown(fixture, monkeypatch):
+    monkeypatch.setattr(storage_converter, "CONFLUENCE_DOMAIN", "acme.atlassian.net")
+    soup = BeautifulSoup((FIXTURES / f"{fixture}.html").read_text(), "html.parser")
+
+    result = extract_text_and_images(soup, "123", USER_NAMES)
+
+    assert result["text"] + "\n" == (FIXTURES / f"{fixture}.md").read_text()
+
+
+def test_images_and_mentions_are_collected():
+    soup = BeautifulSoup((FIXTURES / "macros_images.html").read_text(), "html.parser")
+    assert len(extract_text_and_images(soup, "123")["images"]) == 3
+
+    soup = BeautifulSoup((FIXTURES / "lists.html").read_text(), "html.parser")
+    assert collect_account_ids(soup) == ["557058:bob"]
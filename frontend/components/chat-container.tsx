@@ -16,6 +16,8 @@ export function ChatContainer() {
   const [currentChatId, setCurrentChatId] = useState<string | null>(null)
   const [currentChatTitle, setCurrentChatTitle] = useState("New Chat")
   const [messages, setMessages] = useState<Message[]>([])
+  const [earlierCursor, setEarlierCursor] = useState<string | null>(null)
+  const [isLoadingEarlier, setIsLoadingEarlier] = useState(false)
   const [isLoading, setIsLoading] = useState(false) // For fetching history
   const [isGenerating, setIsGenerating] = useState(false) // For generating new answer
   const sidebarRef = useRef<SidebarRef>(null)
@@ -32,6 +34,7 @@ export function ChatContainer() {
       }
     } else {
       setMessages([])
+      setEarlierCursor(null)
       setIsLoading(false)
       setIsGenerating(false)
       setCurrentChatTitle("New Chat")
@@ -41,8 +44,9 @@ export function ChatContainer() {
   const loadMessages = async (chatId: string) => {
     try {
       setIsLoading(true)
-      const data = await chatApi.getMessages(chatId)
+      const { messages: data, nextCursor } = await chatApi.getMessages(chatId)
       setMessages(data)
+      setEarlierCursor(nextCursor)
     } catch (error) {
       console.error("Failed to load messages:", error)
     } finally {
@@ -50,6 +54,20 @@ export function ChatContainer() {
     }
   }
 
+  const loadEarlierMessages = async () => {
+    if (!currentChatId || !earlierCursor || isLoadingEarlier) return
+    try {
+      setIsLoadingEarlier(true)
+      const { messages: older, nextCursor } = await chatApi.getMessages(currentChatId, earlierCursor)
+      setMessages(prev => [...older, ...prev])
+      setEarlierCursor(nextCursor)
+    } catch (error) {
+      console.error("Failed to load earlier messages:", error)
+    } finally {
+      setIsLoadingEarlier(false)
+    }
+  }
+
   const handleChatSelect = (chatId: string) => {
     setCurrentChatId(chatId)
     // The title will be updated by the sidebar selection or api fetch if we stored it
@@ -137,6 +155,9 @@ export function ChatContainer() {
               messages={messages}
               isLoading={isLoading}
               isGenerating={isGenerating}
+              hasEarlier={!!earlierCursor}
+              isLoadingEarlier={isLoadingEarlier}
+              onLoadEarlier={loadEarlierMessages}
             />
             <ChatInput
               chatId={currentChatId}
@@ -12,6 +12,9 @@ interface ChatMessagesProps {
   messages: Message[]
   isLoading: boolean
   isGenerating?: boolean
+  hasEarlier?: boolean
+  isLoadingEarlier?: boolean
+  onLoadEarlier?: () => void
 }
 
 
@@ -159,15 +162,24 @@ function SourceLinks({ links, titles }: { links: string[]; titles: string[] }) {
   )
 }
 
-export function ChatMessages({ chatId, messages, isLoading, isGenerating }: ChatMessagesProps) {
+export function ChatMessages({
+  chatId,
+  messages,
+  isLoading,
+  isGenerating,
+  hasEarlier,
+  isLoadingEarlier,
+  onLoadEarlier,
+}: ChatMessagesProps) {
   const scrollRef = useRef<HTMLDivElement>(null)
+  const lastMessageId = messages[messages.length - 1]?.id
 
-  // Scroll to bottom when messages change
+  // Scroll to bottom when a new message arrives (not when earlier ones are prepended)
   useEffect(() => {
     if (scrollRef.current) {
       scrollRef.current.scrollIntoView({ behavior: "smooth" })
     }
-  }, [messages, isGenerating])
+  }, [lastMessageId, isGenerating])
 
   if (isLoading) {
     return (
@@ -186,8 +198,21 @@ export function ChatMessages({ chatId, messages, isLoading, isGenerating }: Chat
           </div>
         )}
 
-        {messages.map((message, index) => (
-          <div key={index} className={`flex ${message.role === "user" ? "justify-end" : "justify-start"} gap-4`}>
+        {hasEarlier && (
+          <div className="flex justify-center">
+            <button
+              type="button"
+              onClick={onLoadEarlier}
+              disabled={isLoadingEarlier}
+              className="text-xs text-muted-foreground hover:text-foreground disabled:opacity-50"
+            >
+              {isLoadingEarlier ? "Loading..." : "Load earlier messages"}
+            </button>
+          </div>
+        )}
+
+        {messages.map((message) => (
+          <div key={message.id} className={`flex ${message.role === "user" ? "justify-end" : "justify-start"} gap-4`}>
             <div
               className={`max-w-3xl px-5 py-3.5 rounded-2xl shadow-sm text-sm leading-relaxed ${message.role === "user"
                 ? "bg-primary text-primary-foreground rounded-br-none"
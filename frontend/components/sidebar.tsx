@@ -26,6 +26,8 @@ export interface SidebarRef {
 export const Sidebar = React.forwardRef<SidebarRef, SidebarProps>(({ currentChatId, onChatSelect, onNewChat, isGenerating }, ref) => {
   const [chats, setChats] = useState<Chat[]>([])
   const [loading, setLoading] = useState(true)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [mobileOpen, setMobileOpen] = useState(false)
   const [editingId, setEditingId] = useState<string | null>(null)
   const [editingTitle, setEditingTitle] = useState("")
@@ -45,8 +47,9 @@ export const Sidebar = React.forwardRef<SidebarRef, SidebarProps>(({ currentChat
   const loadChats = async (isRefresh = false) => {
     try {
       if (!isRefresh) setLoading(true)
-      const data = await chatApi.getChats()
+      const { chats: data, nextCursor } = await chatApi.getChats()
       setChats(data || [])
+      setNextCursor(nextCursor)
     } catch (error) {
       console.error("Failed to load chats:", error)
     } finally {
@@ -54,6 +57,21 @@ export const Sidebar = React.forwardRef<SidebarRef, SidebarProps>(({ currentChat
     }
   }
 
+  const loadMoreChats = async () => {
+    if (!nextCursor || loadingMore) return
+    try {
+      setLoadingMore(true)
+      const { chats: older, nextCursor: cursor } = await chatApi.getChats(nextCursor)
+      // Activity may reorder chats between pages, so skip ones already listed
+      setChats((prev) => [...prev, ...older.filter((chat) => !prev.some((p) => p.id === chat.id))])
+      setNextCursor(cursor)
+    } catch (error) {
+      console.error("Failed to load more chats:", error)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const handleNewChat = () => {
     onNewChat?.()
     setMobileOpen(false)
@@ -184,6 +202,17 @@ export const Sidebar = React.forwardRef<SidebarRef, SidebarProps>(({ currentChat
           </div>
         ))
       )}
+      {!loading && nextCursor && (
+        <Button
+          variant="ghost"
+          size="sm"
+          className="w-full text-xs text-sidebar-foreground/70"
+          disabled={loadingMore}
+          onClick={loadMoreChats}
+        >
+          {loadingMore ? "Loading..." : "Load more chats"}
+        </Button>
+      )}
     </div>
   )
 
@@ -31,23 +31,30 @@ export const chatApi = {
     }
   },
 
-  async getChats(): Promise<Chat[]> {
-    const data = await authService.apiCall<{ id: number; name: string }[]>("/chat/chats", "GET")
-    return data.map((s) => ({
+  async getChats(cursor?: string): Promise<{ chats: Chat[]; nextCursor: string | null }> {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : ""
+    const { data, nextCursor } = await authService.apiPage<{ id: number; name: string }>(`/chat/chats${query}`)
+    const chats = data.map((s) => ({
       id: s.id.toString(),
       title: s.name,
       created_at: new Date().toISOString(),
       updated_at: new Date().toISOString(),
     }))
+    return { chats, nextCursor }
   },
 
-  async getMessages(chatId: string): Promise<Message[]> {
-    const data = await authService.apiCall<{ role: string; content: string; links?: string[]; titles?: string[] }[]>(
-      `/chat/chats/${chatId}/messages`,
-      "GET"
-    )
-    return data.map((m, index) => ({
-      id: `${chatId}-${index}`,
+  // Returns the newest page in chronological order; the cursor fetches the page before it
+  async getMessages(chatId: string, cursor?: string): Promise<{ messages: Message[]; nextCursor: string | null }> {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : ""
+    const { data, nextCursor } = await authService.apiPage<{
+      id: number
+      role: string
+      content: string
+      links?: string[]
+      titles?: string[]
+    }>(`/chat/chats/${chatId}/messages${query}`)
+    const messages = data.map((m) => ({
+      id: m.id.toString(),
       chat_id: chatId,
       role: m.role as "user" | "assistant",
       content: m.content,
@@ -55,6 +62,7 @@ export const chatApi = {
       links: m.links,
       titles: m.titles,
     }))
+    return { messages, nextCursor }
   },
 
   async sendMessage(chatId: string, message: string): Promise<{ answer: string; links: string[]; titles: string[]; session_name: string }> {
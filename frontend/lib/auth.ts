@@ -36,6 +36,22 @@ export const authService = {
     body?: Record<string, any> | URLSearchParams,
     customHeaders?: HeadersInit,
   ): Promise<T> {
+    const response = await authService.request(endpoint, method, body, customHeaders)
+    return response.json()
+  },
+
+  // Paged GET: list endpoints send the cursor for the next page in X-Next-Cursor
+  async apiPage<T>(endpoint: string): Promise<{ data: T[]; nextCursor: string | null }> {
+    const response = await authService.request(endpoint, "GET")
+    return { data: await response.json(), nextCursor: response.headers.get("X-Next-Cursor") }
+  },
+
+  async request(
+    endpoint: string,
+    method: "GET" | "POST" | "PUT" | "DELETE" = "GET",
+    body?: Record<string, any> | URLSearchParams,
+    customHeaders?: HeadersInit,
+  ): Promise<Response> {
     const token = authService.getToken()
     const headers: HeadersInit = {
       "Content-Type": "application/json",
@@ -67,7 +83,7 @@ export const authService = {
         try {
           await authService.refreshToken()
           // Retry the request
-          return authService.apiCall<T>(endpoint, method, body, customHeaders)
+          return authService.request(endpoint, method, body, customHeaders)
         } catch (error) {
           authService.clearToken()
           window.location.href = "/login"
@@ -80,7 +96,7 @@ export const authService = {
       throw new Error(errorData.detail)
     }
 
-    return response.json()
+    return response
   },
 
   // Authentication endpoints